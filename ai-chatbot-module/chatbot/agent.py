@@ -1,6 +1,6 @@
 # File: ai-chatbot-module/chatbot/agent.py
 
-import json
+import os
 import traceback
 from typing import Dict, Any, Callable, Optional
 from spellchecker import SpellChecker
@@ -13,6 +13,7 @@ from .visualizer import AutoVisualizer
 from .supabase_manager import SupabaseManager
 from .cache_manager import SimpleCacheManager
 from .activity_logger import ActivityLogger
+from .kb_builder import load_knowledge_base, resolve_column
 
 class ChatbotAgent:
     def __init__(self):
@@ -26,12 +27,13 @@ class ChatbotAgent:
         self.cache_manager = SimpleCacheManager()
         self.activity_logger = ActivityLogger()
         self.last_interaction_by_user: Dict[str, Dict[str, Any]] = {}
+        # schema_introspector.py writes the gzipped form; a plain knowledge_base.json is still accepted
+        kb_path = "knowledge_base.json.gz" if os.path.exists("knowledge_base.json.gz") else "knowledge_base.json"
         try:
-            with open("knowledge_base.json", 'r') as f:
-                self.knowledge_base = json.load(f)
-            print("✓ Knowledge Base ('knowledge_base.json') loaded successfully.")
+            self.knowledge_base = load_knowledge_base(kb_path)
+            print(f"✓ Knowledge Base ('{kb_path}') loaded successfully.")
         except Exception as e:
-            print(f"🔥 CRITICAL ERROR loading knowledge_base.json: {e}")
+            print(f"🔥 CRITICAL ERROR loading {kb_path}: {e}")
             self.knowledge_base = None
         print("="*70); print("✅ Agent initialized!"); print("="*70 + "\n")
 
@@ -270,8 +272,61 @@ class ChatbotAgent:
         
         return fixed_sql
 
-    def process(self, user_prompt: str, user_id: str, execute_query: Optional[Callable] = None) -> Dict[str, Any]:
-        if not self.knowledge_base or len(self.knowledge_base) == 0:
+    def _fix_column_names_in_sql(self, sql: str, db_error: Exception, knowledge_base: Dict) -> str:
+        """
+        Replaces the column a "column ... does not exist" error names with the closest real column
+        of a table the query uses (see resolve_column), so a misspelled column doesn't need a new query.
+        Only references to that column are rewritten: not string literals, AS aliases or other tables' columns.
+        """
+        import re
+        # PostgreSQL reports either column "name" or column alias.name
+        match = re.search(r'column (?:"?(\w+)"?\.)?"?(\w+)"? does not exist', str(db_error), flags=re.IGNORECASE)
+        if not match:
+            return sql
+        qualifier, bad_column = match.groups()
+        for table_name in knowledge_base:
+            # The table itself and any alias it is given in the query ("FROM sales s", "JOIN sales AS s")
+            names = {m.group(1).lower() for m in re.finditer(
+                rf'\b{re.escape(table_name)}"?\s+(?:AS\s+)?(\w+)', sql, flags=re.IGNORECASE)}
+            if not names and not re.search(rf'\b{re.escape(table_name)}\b', sql, flags=re.IGNORECASE):
+                continue
+            names.add(table_name.lower())
+            if qualifier and qualifier.lower() not in names:
+                continue
+            column = resolve_column(knowledge_base, table_name, bad_column)
+            if column and column != bad_column:
+                print(f"[Agent] Resolved column '{bad_column}' to '{column}' in table '{table_name}'")
+                return self._replace_column_reference(sql, qualifier, bad_column, column)
+        return sql
+
+    def _replace_column_reference(self, sql: str, qualifier: Optional[str], old: str, new: str) -> str:
+        """Rewrites column references to `old` (qualifier.old when qualified), outside string literals and AS aliases."""
+        import re
+        if qualifier:
+            pattern = re.compile(rf'(?<![\w.])("?{re.escape(qualifier)}"?\.)("?){re.escape(old)}\2(?![\w"])', re.IGNORECASE)
+        else:
+            pattern = re.compile(rf'(?<![\w.])()("?){re.escape(old)}\2(?![\w"])')
+
+        def replace(segment: str) -> str:
+            def repl(m):
+                # "AS old" names an output column; it is not the failing reference
+                if re.search(r'\bAS\s*$', segment[:m.start()], flags=re.IGNORECASE):
+                    return m.group(0)
+                return f"{m.group(1)}{m.group(2)}{new}{m.group(2)}"
+            return pattern.sub(repl, segment)
+
+        # Odd-indexed parts are single-quoted string literals; they are left untouched
+        parts = re.split(r"('(?:[^']|'')*')", sql)
+        return "".join(part if i % 2 else replace(part) for i, part in enumerate(parts))
+
+    def process(self, user_prompt: str, user_id: str, execute_query: Optional[Callable] = None,
+                knowledge_base: Optional[Dict] = None, fast_json_charts: bool = False,
+                cache_scope: str = "") -> Dict[str, Any]:
+        # The knowledge base is per call (one per connection in main.py); it is never stored on the agent,
+        # and cached answers are keyed by cache_scope (the connection), so concurrent requests against
+        # different databases can share one agent
+        knowledge_base = knowledge_base or self.knowledge_base
+        if not knowledge_base or len(knowledge_base) == 0:
             return {"success": False, "response": "Knowledge base not configured. Please contact an administrator."}
         try:
             print(f"[Agent] Starting to process query: '{user_prompt[:50]}...'")
@@ -293,7 +348,7 @@ class ChatbotAgent:
                 return result
 
             # The rest of the logic for data and meta queries
-            cached_result = self.cache_manager.get(corrected_prompt, user_id)
+            cached_result = self.cache_manager.get(corrected_prompt, user_id, cache_scope)
             if cached_result:
                 cached_result["from_cache"] = True
                 return cached_result
@@ -305,7 +360,7 @@ class ChatbotAgent:
             print(f"[Agent] Intent: {intent_data.get('intent', 'unknown')}")
             full_prompt_for_sql = f"History:\n{conversation_history}\n\nLatest Request: {corrected_prompt}"
             print(f"[Agent] Generating SQL query...")
-            generated_query = self.query_generator.generate_sql(full_prompt_for_sql, intent_data, self.knowledge_base)
+            generated_query = self.query_generator.generate_sql(full_prompt_for_sql, intent_data, knowledge_base)
             print(f"[Agent] SQL generated: {generated_query[:100] if generated_query else 'None'}...")
 
             if not generated_query or not generated_query.strip().upper().startswith("SELECT"):
@@ -340,6 +395,22 @@ class ChatbotAgent:
                         else:
                             error_msg = f"I encountered a date format error. The dates in your database might be in a different format. Could you try rephrasing your question?"
                             return {"success": False, "response": error_msg, "error": str(db_error), "generated_query": generated_query}
+                    elif "column" in error_str and "does not exist" in error_str:
+                        # Most likely a misspelled column; map it to the closest one in the knowledge base
+                        fixed_query = self._fix_column_names_in_sql(generated_query, db_error, knowledge_base)
+                        if fixed_query != generated_query:
+                            try:
+                                print(f"[Agent] Retrying with resolved column name...")
+                                query_results = execute_query(fixed_query)
+                                print(f"[Agent] Query executed successfully after column name fix!")
+                                generated_query = fixed_query  # Update to use the fixed query
+                            except Exception as retry_error:
+                                print(f"[Agent] Retry with resolved column name also failed: {retry_error}")
+                                error_msg = f"I encountered an error while querying the database: {str(retry_error)}. The query I generated might not match your database schema. Could you try rephrasing your question or being more specific about what data you'd like to see?"
+                                return {"success": False, "response": error_msg, "error": str(retry_error), "generated_query": fixed_query}
+                        else:
+                            error_msg = f"I encountered an error while querying the database: {str(db_error)}. The query I generated might not match your database schema. Could you try rephrasing your question or being more specific about what data you'd like to see?"
+                            return {"success": False, "response": error_msg, "error": str(db_error), "generated_query": generated_query}
                     else:
                         error_msg = f"I encountered an error while querying the database: {str(db_error)}. The query I generated might not match your database schema. Could you try rephrasing your question or being more specific about what data you'd like to see?"
                         return {"success": False, "response": error_msg, "error": str(db_error), "generated_query": generated_query}
@@ -367,13 +438,13 @@ class ChatbotAgent:
                 print(f"[Agent] Applied final typo correction pass")
             
             print(f"[Agent] Creating visualization...")
-            visualization, chart_type = self.visualizer.create_chart(query_results, corrected_prompt, intent_data['intent'])
+            visualization, chart_type = self.visualizer.create_chart(query_results, corrected_prompt, intent_data['intent'], fast_json=fast_json_charts)
             print(f"[Agent] Processing complete!")
             
             result = {"success": True, "response": response_text, "intent": intent_data, "generated_query": generated_query, "visualization": visualization, "chart_type": chart_type}
             
             self.supabase_manager.add_to_history(user_id, user_prompt, result['response'])
-            self.cache_manager.set(corrected_prompt, user_id, result)
+            self.cache_manager.set(corrected_prompt, user_id, result, cache_scope)
             self.activity_logger.log(user_id, user_prompt, result)
             
             return result
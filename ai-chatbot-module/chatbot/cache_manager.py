@@ -13,23 +13,24 @@ class SimpleCacheManager:
         self.cache: Dict[str, Dict[str, Any]] = {}
         print("✓ In-Memory Cache Manager is ready.")
 
-    def _generate_key(self, user_prompt: str, user_id: str) -> str:
-        """Generates a consistent, unique cache key."""
-        normalized_prompt = ' '.join(user_prompt.lower().strip().split())
-        key_string = f"{user_id}::{normalized_prompt}"
+    def _generate_key(self, user_prompt: str, user_id: str, scope: str = "") -> str:
+        """Generates a consistent, unique cache key. `scope` separates answers for different databases."""
+        # Case, whitespace and trailing punctuation do not change the question: "Q1 revenue?" == "q1  revenue"
+        normalized_prompt = ' '.join(user_prompt.lower().split()).rstrip('?.! ')
+        key_string = f"{scope}::{user_id}::{normalized_prompt}"
         return hashlib.md5(key_string.encode('utf-8')).hexdigest()
 
-    def get(self, user_prompt: str, user_id: str) -> Optional[Dict[str, Any]]:
+    def get(self, user_prompt: str, user_id: str, scope: str = "") -> Optional[Dict[str, Any]]:
         """Retrieves an item from the cache. Returns None on a cache miss."""
-        key = self._generate_key(user_prompt, user_id)
+        key = self._generate_key(user_prompt, user_id, scope)
         if key in self.cache:
             print("[Cache HIT]")
             return self.cache[key]
         print("[Cache MISS]")
         return None
 
-    def set(self, user_prompt: str, user_id: str, value: Dict[str, Any]):
+    def set(self, user_prompt: str, user_id: str, value: Dict[str, Any], scope: str = ""):
         """Adds or updates an item in the cache."""
-        key = self._generate_key(user_prompt, user_id)
+        key = self._generate_key(user_prompt, user_id, scope)
         if key:
             self.cache[key] = value
\ No newline at end of file
@@ -0,0 +1,198 @@
+# chatbot/kb_builder.py
+"""
+Knowledge Base Builder
+Introspects a database into the enriched schema dict the agent works from.
+"""
+import difflib
+import gzip
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional
+from sqlalchemy import MetaData, inspect
+
+# orjson (optional) reads and writes large knowledge bases several times faster than the stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# rapidfuzz (optional) for resolve_column; difflib is the fallback
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
+
+# Concurrent LLM description requests in use_llm mode; lower it if the provider rate-limits
+LLM_WORKERS = int(os.getenv("KB_LLM_WORKERS", "16"))
+# Tables/columns described per LLM request
+DESCRIPTION_BATCH_SIZE = 25
+
+
+def generate_description(llm, item_type: str, item_name: str, parent_name: str = None) -> str:
+    """Uses an LLM to generate a plain-English description for a DB object."""
+    if parent_name:
+        prompt = f"The database table is named '{parent_name}'. Generate a very concise, one-sentence, business-focused description for the column named '{item_name}'."
+    else:
+        prompt = f"Generate a very concise, one-sentence, business-focused description for a database table named '{item_name}'."
+
+    description = llm.generate(
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.1,
+        max_tokens=60
+    )
+    # Clean up the response
+    return description.strip().replace('"', '')
+
+
+def dump_knowledge_base(kb: Dict, path: str, compress: Optional[bool] = None, indent: bool = True):
+    """Write kb as JSON to path, gzip-compressed when compress is True (default: when path ends in .gz)."""
+    if orjson is not None:
+        data = orjson.dumps(kb, option=orjson.OPT_INDENT_2 if indent else 0)
+    else:
+        data = json.dumps(kb, indent=2 if indent else None).encode("utf-8")
+    if compress is None:
+        compress = path.endswith(".gz")
+    with (gzip.open if compress else open)(path, "wb") as f:
+        f.write(data)
+
+
+def load_knowledge_base(path: str) -> Dict:
+    """Read a knowledge base written by dump_knowledge_base (gzip-compressed if path ends in .gz)."""
+    with (gzip.open if path.endswith(".gz") else open)(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def resolve_column(kb: Dict, table: str, col_guess: str, score_cutoff: int = 85) -> Optional[str]:
+    """
+    Maps a misspelled column name ("customer_idd") to the closest column of `table` in kb
+    ("customer_id"). Returns None when the table is unknown or nothing scores score_cutoff (0-100).
+    """
+    columns = kb.get(table, {}).get("columns")
+    if not columns:
+        return None
+    if col_guess in columns:
+        return col_guess
+    if process is not None:
+        match = process.extractOne(col_guess, columns.keys(), scorer=fuzz.WRatio, score_cutoff=score_cutoff)
+        return match[0] if match else None
+    matches = difflib.get_close_matches(col_guess, columns.keys(), n=1, cutoff=score_cutoff / 100)
+    return matches[0] if matches else None
+
+
+@lru_cache(maxsize=4096)
+def _humanize(name: str) -> str:
+    """'order_date' -> 'Order Date'. Cached: the same table/column names recur across connections and rebuilds."""
+    return name.replace('_', ' ').title()
+
+
+def _item_key(item) -> str:
+    """'table' for a table item (table, None), 'table.column' for a column item (table, column)."""
+    table_name, column_name = item
+    return f"{table_name}.{column_name}" if column_name else table_name
+
+
+def _parse_json_object(text: str) -> Dict:
+    """The JSON object in an LLM reply: the whole reply, else the outermost {...} in it (e.g. inside a code fence)."""
+    for candidate in (text, *re.findall(r'\{.*\}', text, flags=re.DOTALL)):
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return {}
+
+
+def generate_descriptions_batch(llm, items) -> Dict:
+    """
+    Describes several tables/columns with one LLM request. items are (table, None) or (table, column).
+
+    Returns {item: description}; any item missing from the reply is described with its own
+    generate_description call.
+    """
+    keys = {_item_key(item): item for item in items}
+    prompt = (
+        "For each database object below, write a very concise, one-sentence, business-focused description. "
+        "Plain names are tables; 'table.column' names are columns of that table. "
+        "Return only a JSON object mapping each name exactly as given to its description.\n\n"
+        + "\n".join(keys)
+    )
+    reply = llm.generate(
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.1,
+        max_tokens=60 * len(keys) + 50,
+        fix_typos=False  # typo fixes could corrupt the JSON; descriptions are short and low-risk
+    )
+    parsed = _parse_json_object(reply or "")
+
+    descriptions = {}
+    for key, item in keys.items():
+        description = parsed.get(key)
+        if isinstance(description, str) and description.strip():
+            descriptions[item] = description.strip().replace('"', '')
+        elif item[1]:
+            descriptions[item] = generate_description(llm, "column", item[1], parent_name=item[0])
+        else:
+            descriptions[item] = generate_description(llm, "table", item[0])
+    return descriptions
+
+
+def build_knowledge_base(engine, limit: Optional[int] = None, use_llm: bool = False, llm=None) -> Dict:
+    """
+    Builds the knowledge base for the first `limit` tables (all tables when None).
+
+    Fast mode (default) derives descriptions from table and column names; use_llm=True asks the LLM
+    manager (`llm`, or a new FreeLLMManager) for them, in batches. Columns, primary keys and foreign
+    keys for all tables come from one batched MetaData.reflect().
+    """
+    if use_llm and llm is None:
+        from .llm_manager import FreeLLMManager
+        llm = FreeLLMManager()
+
+    table_names = inspect(engine).get_table_names()[:limit]
+    metadata = MetaData()
+    # resolve_fks=False: referenced tables are named from the FK target, not reflected as well
+    metadata.reflect(bind=engine, only=table_names, resolve_fks=False)
+
+    llm_descriptions = {}
+    if use_llm:
+        # DESCRIPTION_BATCH_SIZE tables/columns per LLM request, with the requests overlapped.
+        # Keys are (table, None) for a table and (table, column) for a column
+        items = [(table_name, None) for table_name in table_names]
+        items += [(table_name, column.name) for table_name in table_names for column in metadata.tables[table_name].columns]
+        batches = [items[i:i + DESCRIPTION_BATCH_SIZE] for i in range(0, len(items), DESCRIPTION_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=LLM_WORKERS) as executor:
+            for batch_descriptions in executor.map(lambda batch: generate_descriptions_batch(llm, batch), batches):
+                llm_descriptions.update(batch_descriptions)
+
+    enriched_schema = {}
+    for table_name in table_names:
+        if use_llm:
+            table_desc = llm_descriptions[(table_name, None)]
+        else:
+            table_desc = _humanize(table_name) + " table"
+        columns = {}
+        for column in metadata.tables[table_name].columns:
+            fk = next(iter(column.foreign_keys), None)
+            foreign_key = None
+            if fk is not None:
+                ref_table, ref_column = fk.target_fullname.split('.')[-2:]
+                foreign_key = f"references {ref_table}({ref_column})"
+            if use_llm:
+                col_desc = llm_descriptions[(table_name, column.name)]
+            else:
+                col_desc = _humanize(column.name)
+            columns[column.name] = {
+                # Type names repeat across columns and tables; keep one copy of each
+                "type": sys.intern(str(column.type)),
+                "description": col_desc,
+                "is_primary_key": column.primary_key,
+                "foreign_key": foreign_key,
+            }
+        enriched_schema[table_name] = {"description": table_desc, "columns": columns}
+    return enriched_schema
@@ -4,17 +4,28 @@ Professional Business Analytics Visualization Engine
 Supports all major chart types for business data analysis
 """
 
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from __future__ import annotations
+
+import numpy as np
 import pandas as pd
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Union, TYPE_CHECKING
 
-class AutoVisualizer:
-    """Intelligent visualization suite with comprehensive chart type support."""
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
-    def __init__(self):
-        self.color_schemes = {
+# Plotly is heavy to import; load it the first time a chart is actually built
+px = go = make_subplots = None
+_COLOR_SCHEMES = None
+
+def _ensure_plotly():
+    """Import plotly (and build the color schemes that depend on it) on first use."""
+    global px, go, make_subplots, _COLOR_SCHEMES
+    if px is None:
+        import plotly.express as _px
+        import plotly.graph_objects as _go
+        from plotly.subplots import make_subplots as _make_subplots
+        px, go, make_subplots = _px, _go, _make_subplots
+        _COLOR_SCHEMES = {
             'teal': px.colors.sequential.Teal,
             'blue': px.colors.sequential.Blues,
             'green': px.colors.sequential.Greens,
@@ -22,21 +33,44 @@ class AutoVisualizer:
             'purple': px.colors.sequential.Purples,
             'viridis': px.colors.sequential.Viridis,
         }
+
+class AutoVisualizer:
+    """Intelligent visualization suite with comprehensive chart type support."""
+
+    def __init__(self):
         print("✓ Professional Business Visualizer is ready.")
 
+    @property
+    def color_schemes(self) -> dict:
+        _ensure_plotly()
+        return _COLOR_SCHEMES
+
     def create_chart(
         self,
         data: pd.DataFrame,
         question: str,
         intent: str,
-        domain: str = 'general'
-    ) -> Tuple[Optional[go.Figure], str]:
+        domain: str = 'general',
+        fast_json: bool = False
+    ) -> Tuple[Optional[Union[go.Figure, dict]], str]:
         """
         Intelligently select and create the best visualization for business analytics.
+
+        With fast_json=True bar charts (the most common type) are built directly as a plain Plotly
+        JSON dict, skipping go.Figure construction and validation; other chart types are still
+        returned as figures. Dict labels may hold Timestamps/Decimals, so the caller serializes them
+        with a datetime/Decimal-aware encoder (main.dumps_chart).
         """
         if data is None or data.empty:
             return None, "none"
 
+        _ensure_plotly()
+
+        bar_chart = self._create_bar_chart_json if fast_json else self._create_bar_chart
+        return self._select_chart(data, question, intent, domain, bar_chart)
+
+    def _select_chart(self, data: pd.DataFrame, question: str, intent: str, domain: str, bar_chart) -> tuple:
+        """Pick and build the chart; `bar_chart` is the bar builder to use (figure or JSON)."""
         question_lower = question.lower()
         
         # Data structure analysis
@@ -139,9 +173,9 @@ class AutoVisualizer:
         chart_type_map = {
             'donut chart': ('donut', self._create_donut_chart),
             'donutchart': ('donut', self._create_donut_chart),
-            'bar chart': ('bar', self._create_bar_chart),
-            'barchart': ('bar', self._create_bar_chart),
-            'horizontal bar': ('bar', lambda d, x, y, c, dom: self._create_bar_chart(d, x, y, c, dom, horizontal=True)),
+            'bar chart': ('bar', bar_chart),
+            'barchart': ('bar', bar_chart),
+            'horizontal bar': ('bar', lambda d, x, y, c, dom: bar_chart(d, x, y, c, dom, horizontal=True)),
             'line chart': ('line', self._create_line_chart),
             'line graph': ('line', self._create_line_chart),
             'area chart': ('area', self._create_area_chart),
@@ -226,11 +260,11 @@ class AutoVisualizer:
             if data_len <= 20:
                 # Bar chart for comparison
                 if 'top' in question_lower or 'best' in question_lower or 'highest' in question_lower:
-                    return self._create_bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
+                    return bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
                 elif 'bottom' in question_lower or 'worst' in question_lower or 'lowest' in question_lower:
-                    return self._create_bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
+                    return bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
                 else:
-                    return self._create_bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
+                    return bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
             elif data_len > 20 and data_len <= 100:
                 # Treemap for many categories
                 return self._create_treemap(data, categorical_cols[0], numeric_cols[0]), "treemap"
@@ -246,16 +280,35 @@ class AutoVisualizer:
         
         # 6. Default: Bar chart
         if categorical_cols and numeric_cols:
-            return self._create_bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
+            return bar_chart(data, categorical_cols[0], numeric_cols[0], 'teal', domain), "bar"
         
         # 7. Final fallback: Table
         return self._create_table(data, domain), "table"
 
     # === CHART IMPLEMENTATIONS ===
 
+    def _as_category(self, data: pd.DataFrame, col: str) -> pd.DataFrame:
+        """Encode a repetitive string label column as a categorical (keeps first-appearance order)."""
+        series = data[col]
+        # Text is object dtype before pandas 3 and the str/string dtype from it on
+        is_text = pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+        if not is_text or series.nunique() >= 0.5 * len(series):
+            return data
+        return data.assign(**{col: pd.Categorical(series, categories=series.dropna().unique())})
+
+    def _sort_order(self, data: pd.DataFrame, col: str) -> np.ndarray:
+        """Positional order that sorts `data` by `col`, computed on the single column only."""
+        values = data[col].to_numpy()
+        try:
+            return np.argsort(values, kind='stable')
+        except TypeError:
+            # Mixed/None object columns can't be compared by numpy; let pandas place NaN last
+            return data[col].reset_index(drop=True).sort_values(kind='stable').index.to_numpy()
+
     def _create_bar_chart(self, data: pd.DataFrame, x_col: str, y_col: str, color_scheme: str, domain: str, horizontal: bool = False) -> go.Figure:
         """Create a professional bar chart."""
         data_sorted = data.nlargest(30, y_col) if len(data) > 30 else data
+        data_sorted = self._as_category(data_sorted, x_col)
         if horizontal:
             fig = px.bar(
                 data_sorted, 
@@ -288,6 +341,42 @@ class AutoVisualizer:
         )
         return fig
 
+    def _create_bar_chart_json(self, data: pd.DataFrame, x_col: str, y_col: str, color_scheme: str, domain: str, horizontal: bool = False) -> dict:
+        """Build the same bar chart as _create_bar_chart directly as a Plotly JSON dict."""
+        data_sorted = data.nlargest(30, y_col) if len(data) > 30 else data
+        labels = data_sorted[x_col].astype(object).where(data_sorted[x_col].notna(), None).tolist()
+        values = data_sorted[y_col].astype(object).where(data_sorted[y_col].notna(), None).tolist()
+        colors = self.color_schemes.get(color_scheme, self.color_schemes['teal'])
+        step = 1 / (len(colors) - 1) if len(colors) > 1 else 1
+        x_title = x_col.replace('_', ' ').title()
+        y_title = y_col.replace('_', ' ').title()
+        return {
+            "data": [{
+                "type": "bar",
+                "orientation": "h" if horizontal else "v",
+                "x": values if horizontal else labels,
+                "y": labels if horizontal else values,
+                "text": values,
+                "texttemplate": "%{text:.2s}",
+                "textposition": "outside",
+                "marker": {"color": values, "coloraxis": "coloraxis"},
+            }],
+            "layout": {
+                "title": {"text": f"{y_title} by {x_title}"},
+                "xaxis": {"title": {"text": y_col if horizontal else x_col}, "tickangle": 0 if horizontal else -45},
+                "yaxis": {"title": {"text": x_col if horizontal else y_col}},
+                "coloraxis": {
+                    "colorscale": [[i * step, c] for i, c in enumerate(colors)],
+                    "colorbar": {"title": {"text": y_col}},
+                },
+                "showlegend": False,
+                "plot_bgcolor": "white",
+                "paper_bgcolor": "white",
+                "font": {"size": 12},
+                "height": 500,
+            },
+        }
+
     def _create_pie_chart(self, data: pd.DataFrame, labels_col: str, values_col: str, color_scheme: str) -> go.Figure:
         """Create a pie chart."""
         if len(data) > 10:
@@ -295,6 +384,7 @@ class AutoVisualizer:
             others_sum = data.nsmallest(len(data) - 9, values_col)[values_col].sum()
             others_row = pd.DataFrame({labels_col: ['Others'], values_col: [others_sum]})
             data = pd.concat([top_data, others_row], ignore_index=True)
+        data = self._as_category(data, labels_col)
         
         fig = px.pie(
             data, 
@@ -323,6 +413,7 @@ class AutoVisualizer:
             others_sum = data.nsmallest(len(data) - 9, values_col)[values_col].sum()
             others_row = pd.DataFrame({labels_col: ['Others'], values_col: [others_sum]})
             data = pd.concat([top_data, others_row], ignore_index=True)
+        data = self._as_category(data, labels_col)
         
         fig = px.pie(
             data,
@@ -347,11 +438,11 @@ class AutoVisualizer:
 
     def _create_line_chart(self, data: pd.DataFrame, x_col: str, y_col: str, color_scheme: str, domain: str) -> go.Figure:
         """Create a line chart for trends."""
-        data_sorted = data.sort_values(by=x_col)
+        order = self._sort_order(data, x_col)
         fig = px.line(
-            data_sorted,
-            x=x_col,
-            y=y_col,
+            x=data[x_col].to_numpy()[order],
+            y=data[y_col].to_numpy()[order],
+            labels={'x': x_col, 'y': y_col},
             title=f"{y_col.replace('_', ' ').title()} Trend Over Time",
             markers=True,
             line_shape='spline'
@@ -368,11 +459,11 @@ class AutoVisualizer:
 
     def _create_area_chart(self, data: pd.DataFrame, x_col: str, y_col: str, color_scheme: str, domain: str) -> go.Figure:
         """Create an area chart for cumulative trends."""
-        data_sorted = data.sort_values(by=x_col)
+        order = self._sort_order(data, x_col)
         fig = px.area(
-            data_sorted,
-            x=x_col,
-            y=y_col,
+            x=data[x_col].to_numpy()[order],
+            y=data[y_col].to_numpy()[order],
+            labels={'x': x_col, 'y': y_col},
             title=f"{y_col.replace('_', ' ').title()} Over Time",
             color_discrete_sequence=self.color_schemes.get(color_scheme, self.color_schemes['teal'])
         )
@@ -387,12 +478,13 @@ class AutoVisualizer:
 
     def _create_multi_line_chart(self, data: pd.DataFrame, x_col: str, y_cols: List[str], color_scheme: str) -> go.Figure:
         """Create a multi-line chart for comparing multiple metrics."""
-        data_sorted = data.sort_values(by=x_col)
+        order = self._sort_order(data, x_col)
+        x_sorted = data[x_col].to_numpy()[order]
         fig = go.Figure()
         for col in y_cols[:5]:  # Limit to 5 series
             fig.add_trace(go.Scatter(
-                x=data_sorted[x_col],
-                y=data_sorted[col],
+                x=x_sorted,
+                y=data[col].to_numpy()[order],
                 mode='lines+markers',
                 name=col.replace('_', ' ').title(),
                 line=dict(width=2)
@@ -469,13 +561,18 @@ class AutoVisualizer:
     def _create_waterfall(self, data: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
         """Create a waterfall chart for cumulative changes."""
         data_sorted = data.sort_values(by=x_col)
+        x = data_sorted[x_col].to_numpy()
+        y = data_sorted[y_col].to_numpy()
+        measure = np.full(len(data_sorted), 'relative', dtype=object)
+        measure[0] = 'absolute'
+        measure[-1] = 'total'
         fig = go.Figure(go.Waterfall(
             orientation="v",
-            measure=["absolute"] + ["relative"] * (len(data_sorted) - 2) + ["total"],
-            x=data_sorted[x_col],
+            measure=measure.tolist(),
+            x=x,
             textposition="outside",
-            text=data_sorted[y_col],
-            y=data_sorted[y_col],
+            text=y,
+            y=y,
             connector={"line": {"color": "rgb(63, 63, 63)"}},
         ))
         fig.update_layout(
@@ -4,22 +4,188 @@ Dashboard Analytics Generator
 Generates dynamic dashboard data based on database schema and content
 """
 
+import contextlib
+import copy
+import functools
+import hashlib
 import json
-import pandas as pd
-from sqlalchemy import create_engine, inspect, text
+import logging
+import random
+import re
+import threading
+import time
+import numpy as np
+from sqlalchemy import case, column, create_engine, func, inspect, literal_column, select, table, text
 from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+# Safe table/column names: alphanumeric, underscore and dash only
+_IDENT_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+# Substrings of SQL type names treated as numeric columns
+_NUMERIC_TYPES = ('integer', 'int', 'bigint', 'smallint', 'numeric', 'decimal', 'real', 'double', 'float', 'money')
+
+# Keyword alternations used to classify numeric columns in the metrics and pie chart (matched as substrings)
+def _keyword_re(keywords):
+    return re.compile('|'.join(re.escape(word) for word in keywords))
+
+
+_LOSS_KW = ('loss', 'writeoff', 'bad debt', 'depreciation', 'discount', 'refund', 'return')
+_REVENUE_RE = _keyword_re(('revenue', 'sales', 'income', 'amount', 'total', 'price', 'value'))
+_PURCHASE_RE = _keyword_re(('purchase', 'order', 'transaction', 'quantity'))
+_LOSS_RE = _keyword_re(_LOSS_KW)
+_LOSS_BROAD_RE = _keyword_re(_LOSS_KW + ('cost', 'spent', 'outgoing', 'payment', 'fee', 'charge', 'debit', 'withdrawal', 'deduction'))
+
+# Column-role patterns used by the chart helpers
+_PERSON_RE = _keyword_re(('customer', 'person', 'user', 'client', 'buyer', 'purchaser', 'first_name', 'last_name', 'full_name'))
+_TEXT_TYPE_RE = _keyword_re(('varchar', 'text', 'character'))
+_NAME_TITLE_RE = _keyword_re(('name', 'title'))
+_QUANTITY_RE = _keyword_re(('quantity', 'qty', 'sold', 'sales', 'count'))
+_AMOUNT_RE = _keyword_re(('amount', 'revenue', 'total', 'price', 'value'))
+_CATEGORY_RE = _keyword_re(('category', 'type', 'status', 'brand', 'model'))
+
+# Business type from table names, first matching rule wins
+_BUSINESS_TYPE_RULES = (
+    (_keyword_re(('product', 'inventory', 'stock')), "Inventory"),
+    (_keyword_re(('customer', 'client')), "CRM"),
+    (_keyword_re(('sale', 'transaction', 'order')), "E-commerce"),
+    (_keyword_re(('employee', 'hr', 'staff')), "HR"),
+)
+
 # Import LLM manager for intelligent metric generation
 try:
     from chatbot.llm_manager import FreeLLMManager
     LLM_AVAILABLE = True
 except ImportError:
     LLM_AVAILABLE = False
-    print("Warning: LLM manager not available, using fallback metric generation")
+    log.warning("LLM manager not available, using fallback metric generation")
+
+@dataclass
+class ColumnMeta:
+    """Knowledge-base facts for one column, unpacked once from the JSON dict."""
+    __slots__ = ('description',)
+    description: str
+
+@dataclass
+class Metric:
+    """One metric card on the dashboard overview."""
+    __slots__ = ('label', 'value', 'unit', 'color', 'icon')
+    label: str
+    value: str
+    unit: str
+    color: str
+    icon: str
+    
+    def to_dict(self) -> Dict[str, str]:
+        return {"label": self.label, "value": self.value, "unit": self.unit, "color": self.color, "icon": self.icon}
+
+# Display suffixes for _format_number, largest first
+_NUMBER_SUFFIXES = ((1_000_000, 'M'), (1_000, 'K'))
+
+# Pie chart segments: metric value key, label and color (Revenue light teal, Expenses light purple,
+# Loss light orange, Profit light blue)
+_PIE_KEYS = ('revenue', 'expenses', 'loss', 'profit')
+_PIE_LABELS = ('Revenue', 'Expenses', 'Loss', 'Profit')
+_PIE_COLORS = ('#2dd4bf', '#a78bfa', '#fb923c', '#60a5fa')
+_LOSS_SEGMENT = _PIE_LABELS.index('Loss')
+
+# Column roles resolved with _find_column_smart (lowercase keywords, in priority order)
+_ROLE_KEYWORDS = {
+    "date": ('date', 'created', 'timestamp', 'time', 'updated', 'modified'),
+    "status": ('status', 'state', 'stock_status', 'condition', 'type'),
+    "sales": ('sales', 'revenue', 'amount', 'total', 'price', 'value'),
+    "category": ('category', 'item_category', 'product_category', 'type', 'item_type'),
+    "group": ('product_group', 'group', 'product_group_name', 'item_group', 'segment'),
+    "division": ('division', 'item_division', 'product_division', 'category', 'type'),
+    "quantity": ('quantity', 'qty', 'amount', 'sales', 'sold'),
+    "name": ('product_name', 'item_name', 'product', 'item', 'name', 'title'),
+    "id": ('id', 'item_id', 'product_id', 'item_code', 'product_code'),
+}
+# "Sales by" breakdown charts, each grouping the sales column by its own role
+_BREAKDOWN_ROLES = ("category", "group", "division")
+
+# (label, color, icon) of the four base metrics, used for defaults and padding
+_BASE_METRICS = (
+    ("Total Revenue", "#2dd4bf", "💰"),
+    ("Total Purchases", "#60a5fa", "🛒"),
+    ("Total Loss", "#fb923c", "📉"),
+    ("Total Records", "#a78bfa", "📊"),
+)
+
+class _ChartFailed(Exception):
+    """Raised by a _cached_chart helper whose query failed; carries the fallback result, which is returned uncached."""
+
+    def __init__(self, fallback):
+        super().__init__()
+        self.fallback = fallback
+
+
+def _cached_chart(fn):
+    """Serve a chart helper's result per table for cache_ttl_seconds (±5% jitter so entries do not expire together).
+    
+    Concurrent misses for the same key are collapsed: one caller runs the query, the others wait for its result.
+    A helper that raises _ChartFailed gets its fallback returned but not cached, so the next call retries.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, ctx, *args, **kwargs):
+        if not self.enable_cache:
+            try:
+                return fn(self, ctx, *args, **kwargs)
+            except _ChartFailed as failed:
+                return failed.fallback
+        key = f"{fn.__name__}:{ctx.table}"
+        while True:
+            with self._chart_lock:
+                hit = self._chart_cache.get(key)
+                if hit and time.monotonic() < hit[0]:
+                    return copy.deepcopy(hit[1])
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+            if leader:
+                break
+            # Another thread is building this chart; use its result (or take over if it failed)
+            event.wait()
+        try:
+            try:
+                result = fn(self, ctx, *args, **kwargs)
+            except _ChartFailed as failed:
+                return failed.fallback
+            expiry = time.monotonic() + self.cache_ttl_seconds * random.uniform(0.95, 1.05)
+            with self._chart_lock:
+                self._chart_cache[key] = (expiry, copy.deepcopy(result))
+            return result
+        finally:
+            with self._chart_lock:
+                self._inflight.pop(key, None)
+            event.set()
+    return wrapper
+
+@dataclass
+class SchemaCtx:
+    """Schema facts for one table, gathered once per dashboard build and shared by the chart helpers."""
+    table: str
+    columns: List[str]
+    types: Dict[str, str]
+    size: int
+    use_limit: bool
+    limit_value: Optional[int]
+    column_descriptions: Dict[str, ColumnMeta]
+    sa_table: Any = None  # lightweight Core table() over the validated columns
+    col_text: Dict[str, str] = None  # column -> lowercased "name\ndescription" for keyword matching
+    lower_names: List[tuple] = None  # (column, lowercased column) pairs, in table order
+    desc_lc: Dict[str, str] = None  # column -> lowercased knowledge-base description
+    type_lc: Dict[str, str] = None  # column -> lowercased SQL type
+    numeric_cols: List[str] = None  # numeric, non-ID columns
+    column_matches: Dict[tuple, Optional[str]] = None  # memoized _find_column_smart results by keywords
 
 class DashboardGenerator:
     """Generates dashboard analytics data from database."""
@@ -38,84 +204,249 @@ class DashboardGenerator:
         "#ec4899",  # rose
     ]
     
-    def __init__(self, db_url: str, knowledge_base: Dict):
+    # Chart sections run concurrently, one pooled connection each; the pool keeps spares for setup and the chatbot
+    CHART_WORKERS = 6
+    POOL_SIZE = CHART_WORKERS + 2
+    
+    TOP_SELLING_LIMIT = 10
+    UNSOLD_ITEMS_LIMIT = 50
+    # Groups per "sales by" breakdown; the rest never leave the database
+    BREAKDOWN_LIMIT = 20
+    
+    # Fallback sections used when a chart fails; copied on use so callers get their own dicts
+    _DEFAULT_TOP_SELLING = {
+        "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": BAR_CHART_COLORS}}],
+        "layout": {"title": "Top Selling Products", "xaxis": {"title": "Total Sales"}, "yaxis": {"title": "Product"}, "height": 400}
+    }
+    # Top selling chart when the table has no usable product/sales columns
+    _EMPTY_TOP_SELLING = {
+        "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": "#10b981"}}],
+        "layout": {"title": "Top Selling Products", "xaxis": {"title": "Total Sales"}, "yaxis": {"title": "Product"}, "height": 400}
+    }
+    _DEFAULT_PIE = {
+        "data": [{"type": "pie", "values": [0, 0], "labels": ["Revenue", "Expenses"], "marker": {"colors": ["#2dd4bf", "#a78bfa"]}}],
+        "layout": {"title": "", "showlegend": True}
+    }
+    _DIVISION_COLORS = ["#2dd4bf", "#fb923c", "#60a5fa", "#a78bfa", "#f472b6"]
+    _DEFAULT_CATEGORY_CHART = {
+        "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": BAR_CHART_COLORS}}],
+        "layout": {"title": "Sales by Item Category", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Category"}, "height": 300}
+    }
+    _DEFAULT_GROUP_CHART = {
+        "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": BAR_CHART_COLORS}}],
+        "layout": {"title": "Sales by Product Group", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Product Group"}, "height": 300}
+    }
+    _DEFAULT_DIVISION_CHART = {
+        "data": [{"type": "pie", "values": [], "labels": [], "marker": {"colors": _DIVISION_COLORS}}],
+        "layout": {"title": "Sales by Division", "showlegend": True, "height": 300}
+    }
+    # Whole dashboard served when the database is unavailable, assembled once from the section defaults
+    _DEFAULT_DASHBOARD = {
+        "businessType": "Business",
+        "metrics": [
+            {"label": "Receipt", "value": "0", "unit": "", "color": "#f472b6", "icon": "📄"},
+            {"label": "Sales", "value": "0", "unit": "", "color": "#2dd4bf", "icon": "💰"},
+            {"label": "Quantity", "value": "0", "unit": "", "color": "#a78bfa", "icon": "🛒"},
+            {"label": "Cost", "value": "0", "unit": "", "color": "#fb923c", "icon": "💰"},
+            {"label": "Profit", "value": "0", "unit": "", "color": "#60a5fa", "icon": "📈"},
+            {"label": "Unsold Items %", "value": "0.00", "unit": "%", "color": "#2dd4bf", "icon": "📊"}
+        ],
+        "topSellingChart": _DEFAULT_TOP_SELLING,
+        "salesByCategoryChart": _DEFAULT_CATEGORY_CHART,
+        "salesByGroupChart": _DEFAULT_GROUP_CHART,
+        "pieChart": {
+            "data": [{
+                "type": "pie",
+                "values": [60, 25, 15],
+                "labels": ["Revenue", "Expenses", "Loss"],
+                "marker": {"colors": ["#2dd4bf", "#a78bfa", "#fb923c"]}
+            }],
+            "layout": {"title": "", "showlegend": True}
+        },
+        "salesByDivisionChart": _DEFAULT_DIVISION_CHART,
+        "unsoldItems": []
+    }
+    
+    # Bar colors tiled to the longest bar chart (20 bars); charts slice it instead of cycling per bar
+    _BAR_PALETTE = (BAR_CHART_COLORS * (20 // len(BAR_CHART_COLORS) + 1))[:20]
+    
+    # Identifier-templated SQL, formatted once per (table, column) by _get_stmts; variants are tried in order
+    SQL_TEMPLATES = {
+        "today_count": (
+            'SELECT COUNT(*) FROM {table} WHERE DATE("{col}") = CURRENT_DATE',
+            'SELECT COUNT(*) FROM {table} WHERE "{col}"::date = CURRENT_DATE',
+            'SELECT COUNT(*) FROM {table} WHERE "{col}" >= CURRENT_DATE::date AND "{col}" < (CURRENT_DATE + INTERVAL \'1 day\')::date',
+        ),
+        "week_count": (
+            'SELECT COUNT(*) FROM {table} WHERE "{col}" >= CURRENT_DATE - INTERVAL \'7 days\'',
+            'SELECT COUNT(*) FROM {table} WHERE "{col}"::date >= CURRENT_DATE - INTERVAL \'7 days\'',
+        ),
+        "status_counts": (
+            'SELECT "{col}", COUNT(*) as count FROM {table} GROUP BY "{col}" ORDER BY count DESC LIMIT 5',
+        ),
+    }
+    
+    # How long introspected table schema is reused across dashboard builds (seconds)
+    SCHEMA_CACHE_TTL = 300
+    # Opt-in: serve metric sums from a PostgreSQL materialized view refreshed every SUMMARY_MV_TTL seconds
+    # (creates dash_mv_* objects in the target database, so it needs CREATE privilege there)
+    SUMMARY_MV_ENABLED = os.getenv("DASHBOARD_SUMMARY_MV") == "1"
+    SUMMARY_MV_TTL = 300
+    # Opt-in: lazily create partial (name, metric) indexes for the top-selling query (needs CREATE INDEX rights)
+    AUTO_INDEX_ENABLED = os.getenv("DASHBOARD_AUTO_INDEX") == "1"
+    # Opt-in: exact COUNT(*) for Total Records on large tables instead of the catalog estimate
+    EXACT_COUNTS = os.getenv("DASHBOARD_EXACT_COUNTS") == "1"
+    # How long a fully built dashboard payload is served from memory (seconds)
+    DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+    # Opt-in: rebuild the cached payload in a background thread every N seconds (0 = off), so page loads read
+    # precomputed metrics and charts; keep it below the cache TTL for loads to never wait on the database
+    REFRESH_INTERVAL = float(os.getenv("DASHBOARD_REFRESH_INTERVAL", "0"))
+    
+    def __init__(self, db_url: str, knowledge_base: Dict, enable_cache: bool = True,
+                 cache_ttl_seconds: Optional[float] = None, engine=None):
         self.db_url = db_url
         self.knowledge_base = knowledge_base
-        self.engine = None
-        try:
-            self.engine = create_engine(db_url)
-        except Exception as e:
-            print(f"Warning: Could not connect to database: {e}")
+        # An existing engine (e.g. the caller's pooled one) is used as is; otherwise one is created below
+        self.engine = engine
+        # Payload, pie and chart caches; cache_ttl_seconds defaults to DASHBOARD_CACHE_TTL
+        self.enable_cache = enable_cache
+        self.cache_ttl_seconds = self.DASHBOARD_CACHE_TTL if cache_ttl_seconds is None else cache_ttl_seconds
+        self._chart_cache: Dict[str, tuple] = {}  # "method:table" -> (monotonic expiry, chart result)
+        self._inflight: Dict[str, threading.Event] = {}  # "method:table" -> event set when its build finishes
+        self._chart_lock = threading.Lock()
+        self._schema_cache: Dict[str, tuple] = {}  # table -> (monotonic timestamp, SchemaCtx)
+        self._table_names: Optional[tuple] = None  # (monotonic timestamp, table names)
+        self._cache: Dict[str, tuple] = {}  # db_url -> (monotonic timestamp, dashboard payload)
+        self._indexed_tables: set = set()  # (table, name_col, metric_col) whose partial index was requested
+        self._index_lock = threading.Lock()
+        self._date_query_pref: Dict[tuple, int] = {}  # (template kind, table, column) -> index of the variant that worked
+        self._business_type: Optional[tuple] = None  # (knowledge base it was detected from, business type)
+        self._stmt_cache: Dict[tuple, Any] = {}  # (template kind, table, column) -> text() statement(s)
+        self._summary_mvs: Dict[str, float] = {}  # materialized view name -> monotonic time of last refresh
+        self._reltuples_cache: Dict[str, tuple] = {}  # table -> (monotonic timestamp, catalog row estimate or exact count)
+        self._valid_idents: set = set()  # identifiers that already passed _validate_identifier
+        self._refresher: Optional[threading.Thread] = None  # background rebuild thread, started on first build
+        self._stop_refresh = threading.Event()
+        # Step-by-step build diagnostics are logged at DEBUG. DASHBOARD_LOG_LEVEL (e.g. INFO, DEBUG) sets this
+        # module's level and prints to stderr; DASHBOARD_DEBUG=1 is shorthand for DASHBOARD_LOG_LEVEL=DEBUG
+        self.debug = os.getenv('DASHBOARD_DEBUG') == '1'
+        log_level = os.getenv('DASHBOARD_LOG_LEVEL', 'DEBUG' if self.debug else '').upper()
+        if isinstance(logging.getLevelName(log_level), int):
+            if not log.handlers:
+                log.addHandler(logging.StreamHandler())
+            log.setLevel(log_level)
+        if self.engine is None:
+            try:
+                # Pool sized for the concurrent chart queries in generate_dashboard_data
+                self.engine = create_engine(db_url, pool_size=self.POOL_SIZE, pool_pre_ping=True)
+            except Exception as e:
+                log.warning("Could not connect to database: %s", e)
+    
+    def invalidate(self):
+        """Drop cached dashboard payloads and table schema so the next build hits the database."""
+        self._cache.clear()
+        self._schema_cache.clear()
+        self._table_names = None
+        self._reltuples_cache.clear()
+        self._summary_mvs.clear()  # forces a REFRESH of summary views on next use
+        with self._chart_lock:
+            self._chart_cache.clear()
     
-    def generate_dashboard_data(self) -> Dict[str, Any]:
-        """Generate comprehensive dashboard data."""
-        print("[Dashboard] Starting dashboard generation...")
+    def _start_refresher(self):
+        """Start the REFRESH_INTERVAL background rebuild once, after the first build has warmed the caches."""
+        if self._refresher is not None or self.REFRESH_INTERVAL <= 0 or not self.enable_cache:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="dashboard-refresh", daemon=True)
+        self._refresher.start()
+    
+    def _refresh_loop(self):
+        while not self._stop_refresh.wait(self.REFRESH_INTERVAL):
+            try:
+                # Drop the per-chart results so the rebuild queries fresh data; the payload being served stays
+                # in place until the rebuild replaces it
+                with self._chart_lock:
+                    self._chart_cache.clear()
+                self.generate_dashboard_data(refresh=True)
+            except Exception as e:
+                log.exception("[Dashboard] Background refresh failed: %s", e)
+    
+    def stop_refresh(self):
+        """Stop the background rebuild thread (e.g. when this generator is replaced)."""
+        self._stop_refresh.set()
+    
+    def generate_dashboard_data(self, refresh: bool = False) -> Dict[str, Any]:
+        """Generate comprehensive dashboard data (refresh=True rebuilds even if a cached payload is still fresh)."""
+        cached = self._cache.get(self.db_url) if self.enable_cache and not refresh else None
+        if cached and time.monotonic() - cached[0] < self.cache_ttl_seconds:
+            log.debug("[Dashboard] Serving dashboard from cache")
+            return copy.deepcopy(cached[1])
+        
+        log.debug("[Dashboard] Starting dashboard generation...")
         if not self.engine:
-            print("[Dashboard] No engine, returning default")
-            return self._get_default_dashboard()
+            log.warning("[Dashboard] No engine, returning default")
+            return self.get_default_dashboard()
         
         try:
-            # Analyze database structure
-            print("[Dashboard] Inspecting database...")
-            inspector = inspect(self.engine)
-            tables = inspector.get_table_names()
-            
-            if not tables:
-                print("[Dashboard] No tables found, returning default")
-                return self._get_default_dashboard()
-            
-            print(f"[Dashboard] Found {len(tables)} tables, using first table")
-            # Find primary table (usually the first one or the one with most data)
-            primary_table = self._find_primary_table(tables)
-            print(f"[Dashboard] Primary table: {primary_table}")
+            # Analyze database structure on one connection (table list, columns, size estimate)
+            log.debug("[Dashboard] Inspecting database...")
+            with self.engine.connect() as conn:
+                tables = self._get_table_names(conn)
+                
+                if not tables:
+                    log.warning("[Dashboard] No tables found, returning default")
+                    return self.get_default_dashboard()
+                
+                log.debug("[Dashboard] Found %s tables, using first table", len(tables))
+                # Use the first table as primary - avoids slow COUNT(*) queries to rank tables by size
+                primary_table = tables[0]
+                log.debug("[Dashboard] Primary table: %s", primary_table)
+                ctx = self._get_schema_ctx(conn, primary_table)
+                
+                # The chart sections are independent read-only queries: run them concurrently,
+                # each on its own pooled connection, so latency is max(query) instead of sum(query)
+                log.debug("[Dashboard] Generating metrics and charts in parallel...")
+                chart_tasks = {
+                    "top_selling": self._generate_top_selling_products,
+                    "sales_by_category": self._generate_sales_by_category,
+                    "sales_by_group": self._generate_sales_by_product_group,
+                    "sales_by_division": self._generate_sales_by_division,
+                    "unsold_items": self._generate_unsold_items,
+                }
+                with ThreadPoolExecutor(max_workers=min(self.CHART_WORKERS, len(chart_tasks))) as executor:
+                    futures = {name: executor.submit(fn, ctx) for name, fn in chart_tasks.items()}
+                    # Metrics reuse the inspection connection in this thread instead of checking out another one
+                    # (returns both formatted metrics and raw values)
+                    metrics_result = self._generate_metrics(ctx, conn=conn)
             
-            # Generate metrics (returns both formatted metrics and raw values)
-            print("[Dashboard] Generating metrics...")
-            metrics_result = self._generate_metrics(primary_table, tables)
             metrics = metrics_result["metrics"]
             metric_values = metrics_result["values"]  # Raw numeric values for pie chart
-            print("[Dashboard] Metrics generated")
-            print(f"[Dashboard] Metric values received: Revenue={metric_values.get('revenue')}, Expenses={metric_values.get('expenses')}, Loss={metric_values.get('loss')}, Profit={metric_values.get('profit')}")
-            print(f"[Dashboard] Metric values types: Revenue={type(metric_values.get('revenue'))}, Loss={type(metric_values.get('loss'))}, Loss value={metric_values.get('loss')}, Loss > 0: {metric_values.get('loss', 0) > 0}")
+            log.debug("[Dashboard] Metrics generated")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("[Dashboard] Metric values received: Revenue=%s, Expenses=%s, Loss=%s, Profit=%s", metric_values.get('revenue'), metric_values.get('expenses'), metric_values.get('loss'), metric_values.get('profit'))
+                log.debug("[Dashboard] Metric values types: Revenue=%s, Loss=%s, Loss value=%s, Loss > 0: %s", type(metric_values.get('revenue')), type(metric_values.get('loss')), metric_values.get('loss'), metric_values.get('loss', 0) > 0)
             
-            # Generate top selling products chart (replaces table data)
-            print("[Dashboard] Generating top selling chart...")
+            # Top selling products chart (replaces table data)
             try:
-                top_selling_chart = self._generate_top_selling_products(primary_table, tables)
-                print("[Dashboard] Top selling chart generated")
+                top_selling_chart = futures["top_selling"].result()
+                log.debug("[Dashboard] Top selling chart generated")
             except Exception as e:
-                print(f"[Dashboard] Error generating top selling chart: {e}")
-                top_selling_chart = {
-                "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": self.BAR_CHART_COLORS}}],
-                "layout": {"title": "Top Selling Products", "xaxis": {"title": "Total Sales"}, "yaxis": {"title": "Product"}, "height": 400}
-                }
+                log.warning("[Dashboard] Error generating top selling chart: %s", e)
+                top_selling_chart = copy.deepcopy(self._DEFAULT_TOP_SELLING)
             
             # Generate pie chart data using the same values from metrics
-            print("[Dashboard] Generating pie chart from metrics data...")
+            log.debug("[Dashboard] Generating pie chart from metrics data...")
             try:
                 pie_chart = self._generate_pie_chart_from_metrics(metric_values)
-                print("[Dashboard] Pie chart generated from metrics")
+                log.debug("[Dashboard] Pie chart generated from metrics")
             except Exception as e:
-                print(f"[Dashboard] Error generating pie chart: {e}")
-                import traceback
-                traceback.print_exc()
-                pie_chart = {
-                "data": [{"type": "pie", "values": [0, 0], "labels": ["Revenue", "Expenses"], "marker": {"colors": ["#2dd4bf", "#a78bfa"]}}],
-                "layout": {"title": "", "showlegend": True}
-                }
-            
-            # Generate additional charts for comprehensive dashboard
-            print("[Dashboard] Generating sales by category chart...")
-            sales_by_category_chart = self._generate_sales_by_category(primary_table, tables)
+                log.exception("[Dashboard] Error generating pie chart: %s", e)
+                pie_chart = copy.deepcopy(self._DEFAULT_PIE)
             
-            print("[Dashboard] Generating sales by product group chart...")
-            sales_by_group_chart = self._generate_sales_by_product_group(primary_table, tables)
-            
-            print("[Dashboard] Generating sales by division pie chart...")
-            sales_by_division_chart = self._generate_sales_by_division(primary_table, tables)
-            
-            print("[Dashboard] Generating unsold items list...")
-            unsold_items = self._generate_unsold_items(primary_table, tables)
+            # Additional charts for comprehensive dashboard
+            sales_by_category_chart = futures["sales_by_category"].result()
+            sales_by_group_chart = futures["sales_by_group"].result()
+            sales_by_division_chart = futures["sales_by_division"].result()
+            unsold_items = futures["unsold_items"].result()
             
             # Calculate unsold items percentage and update metrics
             total_items = len(unsold_items) + 10  # Approximate total (will be improved)
@@ -123,31 +454,18 @@ class DashboardGenerator:
             unsold_percentage = (unsold_count / total_items * 100) if total_items > 0 else 0.0
             
             # Update unsold items % metric if it exists, or add it
-            unsold_metric_exists = False
-            for metric in metrics:
-                if metric.get('label') == 'Unsold Items %':
-                    metric['value'] = f"{unsold_percentage:.2f}"
-                    unsold_metric_exists = True
-                    break
-            
-            if not unsold_metric_exists and len(metrics) < 6:
-                # Add unsold items % metric
-                metrics.append({
-                    "label": "Unsold Items %",
-                    "value": f"{unsold_percentage:.2f}",
-                    "unit": "%",
-                    "color": "#10b981",
-                    "icon": "📊"
-                })
+            metrics.setdefault(
+                "Unsold Items %", Metric("Unsold Items %", "", "%", "#10b981", "📊")
+            ).value = f"{unsold_percentage:.2f}"
             
             # Determine business type
-            print("[Dashboard] Determining business type...")
+            log.debug("[Dashboard] Determining business type...")
             business_type = self._detect_business_type()
-            print("[Dashboard] Dashboard generation complete!")
+            log.debug("[Dashboard] Dashboard generation complete!")
             
-            return {
+            dashboard = {
                 "businessType": business_type,
-                "metrics": metrics[:6],  # Ensure exactly 6 metrics
+                "metrics": [m.to_dict() for m in list(metrics.values())[:6]],  # Ensure exactly 6 metrics
                 "topSellingChart": top_selling_chart,
                 "salesByCategoryChart": sales_by_category_chart,
                 "salesByGroupChart": sales_by_group_chart,
@@ -155,136 +473,243 @@ class DashboardGenerator:
                 "salesByDivisionChart": sales_by_division_chart,
                 "unsoldItems": unsold_items
             }
+            self._cache[self.db_url] = (time.monotonic(), copy.deepcopy(dashboard))
+            self._start_refresher()
+            return dashboard
         except Exception as e:
-            print(f"[Dashboard] Error generating dashboard: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._get_default_dashboard()
+            log.exception("[Dashboard] Error generating dashboard: %s", e)
+            return self.get_default_dashboard()
     
     def _get_default_metrics(self) -> List[Dict]:
         """Return default metrics when generation fails."""
-        return [
-            {"label": "Total Revenue", "value": "0", "unit": "", "color": "#2dd4bf", "icon": "💰"},
-            {"label": "Total Purchases", "value": "0", "unit": "", "color": "#60a5fa", "icon": "🛒"},
-            {"label": "Total Loss", "value": "0", "unit": "", "color": "#fb923c", "icon": "📉"},
-            {"label": "Total Records", "value": "0", "unit": "", "color": "#a78bfa", "icon": "📊"}
-        ]
+        return [Metric(label, "0", "", color, icon).to_dict() for label, color, icon in _BASE_METRICS]
+    
+    def _default_metrics_result(self) -> Dict[str, Any]:
+        """Default metrics in the shape _generate_metrics returns."""
+        return {"metrics": {label: Metric(label, "0", "", color, icon) for label, color, icon in _BASE_METRICS}, "values": {}}
     
     def _get_default_top_selling_chart(self) -> Dict:
         """Return default top selling chart when generation fails."""
-        return {
-            "data": [{
-                "type": "bar",
-                "orientation": "h",
-                "x": [],
-                "y": [],
-                "marker": {"color": "#10b981"}
-            }],
-            "layout": {
-                "title": "Top Selling Products",
-                "xaxis": {"title": "Total Sales"},
-                "yaxis": {"title": "Product"},
-                "height": 400
-            }
-        }
-    
-    def _get_default_pie_chart(self) -> Dict:
-        """Return default pie chart when generation fails."""
-        return {
-            "data": [{
-                "type": "pie",
-                "values": [0, 0],
-                "labels": ["Revenue", "Expenses"],
-                "marker": {
-                    "colors": ["#10b981", "#8b5cf6"]
-                }
-            }],
-            "layout": {
-                "title": "",
-                "showlegend": True
-            }
-        }
-    
-    def _find_primary_table(self, tables: List[str]) -> str:
-        """Find the primary table (usually the one with most data)."""
-        # Just use the first table - avoid slow COUNT(*) queries
-        # COUNT(*) on large tables can be very slow
-        return tables[0] if tables else "unknown"
+        return copy.deepcopy(self._EMPTY_TOP_SELLING)
     
     def _validate_identifier(self, identifier: str) -> bool:
         """Validate that identifier is safe (only alphanumeric, underscore, no SQL injection)."""
-        if not identifier or not isinstance(identifier, str):
+        if not isinstance(identifier, str):
             return False
-        # Allow only alphanumeric, underscore, and dash (common in table/column names)
-        import re
-        return bool(re.match(r'^[a-zA-Z0-9_-]+$', identifier))
+        if identifier in self._valid_idents:
+            return True
+        # The same table and column names are checked on every query path; remember the ones that pass
+        if _IDENT_RE.fullmatch(identifier) is None:
+            return False
+        self._valid_idents.add(identifier)
+        return True
+    
+    def _connect(self, conn=None):
+        """Context manager yielding the caller's connection if one is passed, else a pooled one."""
+        return contextlib.nullcontext(conn) if conn is not None else self.engine.connect()
+    
+    def _get_table_names(self, conn) -> List[str]:
+        """Table names of the database, reflected once per SCHEMA_CACHE_TTL seconds."""
+        cached = self._table_names
+        if cached and time.monotonic() - cached[0] < self.SCHEMA_CACHE_TTL:
+            return cached[1]
+        names = inspect(conn).get_table_names()
+        self._table_names = (time.monotonic(), names)
+        return names
+    
+    def _get_schema_ctx(self, conn, primary_table: str) -> SchemaCtx:
+        """Introspect a table once (columns, types, size) and reuse it for SCHEMA_CACHE_TTL seconds."""
+        cached = self._schema_cache.get(primary_table)
+        if cached and time.monotonic() - cached[0] < self.SCHEMA_CACHE_TTL:
+            return cached[1]
+        
+        columns_info = inspect(conn).get_columns(primary_table)
+        # Validate all column names
+        # Only validated names make it into the context; the chart helpers trust ctx.columns from here on
+        column_types = {col['name']: str(col['type']) for col in columns_info if self._validate_identifier(col['name'])}
+        columns = list(column_types)
+        
+        # Get table size estimate to decide on query strategy
+        table_size = self._get_table_size_estimate(conn, primary_table)
+        use_limit = table_size > 100000  # Use LIMIT only for large tables
+        limit_value = 200000 if use_limit else None  # Increased limit for better accuracy
+        
+        # Use knowledge base to understand column meanings
+        table_kb = self.knowledge_base.get(primary_table, {})
+        column_descriptions = {
+            c: ColumnMeta(description=(info or {}).get('description', '') or '')
+            for c, info in table_kb.get('columns', {}).items()
+        }
+        # Lowercase names, descriptions and types once; the chart helpers only do dict lookups
+        desc_lc = {c: getattr(column_descriptions.get(c), 'description', '').lower() for c in columns}
+        type_lc = {c: column_types.get(c, '').lower() for c in columns}
+        col_text = {c: f"{c.lower()}\n{desc_lc[c]}" for c in columns}
+        
+        ctx = SchemaCtx(
+            table=primary_table,
+            columns=columns,
+            types=column_types,
+            size=table_size,
+            use_limit=use_limit,
+            limit_value=limit_value,
+            column_descriptions=column_descriptions,
+            sa_table=table(primary_table, *(column(c) for c in columns)),
+            col_text=col_text,
+            lower_names=[(c, c.lower()) for c in columns],
+            desc_lc=desc_lc,
+            type_lc=type_lc,
+            numeric_cols=self._find_numeric_columns(columns, column_types, column_descriptions),
+            column_matches={},
+        )
+        self._schema_cache[primary_table] = (time.monotonic(), ctx)
+        return ctx
+    
+    def _sample_percent(self, table_size: int, sample_rows: int) -> float:
+        """Percentage of pages TABLESAMPLE SYSTEM should read to see roughly sample_rows rows."""
+        if table_size <= 0:
+            return 100.0
+        return min(100.0, max(1.0, sample_rows * 100.0 / table_size))
+    
+    def _sample_clause(self, ctx: SchemaCtx) -> Optional[tuple]:
+        """(TABLESAMPLE clause, scale factor) for large PostgreSQL tables; None keeps the LIMIT subquery path."""
+        if not (ctx.use_limit and ctx.limit_value) or self.engine.dialect.name != 'postgresql':
+            return None
+        pct = self._sample_percent(ctx.size, ctx.limit_value)
+        return f"TABLESAMPLE SYSTEM ({pct:.4f})", round(100.0 / pct, 6)
+    
+    def _aggregate_source(self, ctx: SchemaCtx, cols: List[str]) -> tuple:
+        """(FROM source, scale factor) for aggregating `cols`: sampled or LIMITed on large tables, whole table otherwise."""
+        tbl = ctx.sa_table
+        if ctx.use_limit and ctx.limit_value and self.engine.dialect.name == 'postgresql':
+            # Large PostgreSQL tables: page-level sample, sums scaled back up to the whole table
+            pct = self._sample_percent(ctx.size, ctx.limit_value)
+            return tbl.tablesample(func.system(pct)), 100.0 / pct
+        if ctx.use_limit and ctx.limit_value:
+            inner_cols = [tbl.c[col] for col in dict.fromkeys(cols)] or [literal_column("1")]
+            dialect = self.engine.dialect.name
+            if dialect in ('sqlite', 'mysql', 'mariadb'):
+                # No TABLESAMPLE: keep each row with probability pct/100 and scale sums by 100/pct. The roll
+                # must be fine-grained: an integer roll (random() % 100 < pct) keeps ceil(pct)% of rows
+                # and overstates the scaled sums
+                pct = self._sample_percent(ctx.size, ctx.limit_value)
+                if dialect == 'sqlite':
+                    keep = func.abs(func.random()) % 1000000 < pct * 10000
+                else:
+                    keep = func.rand() < pct / 100.0
+                return select(*inner_cols).select_from(tbl).where(keep).subquery("subquery"), 100.0 / pct
+            # Use LIMIT for large tables on other databases
+            return select(*inner_cols).select_from(tbl).limit(ctx.limit_value).subquery("subquery"), None
+        # Full query for small tables
+        return tbl, None
+    
+    def _get_reltuples(self, conn, table_name: str) -> Optional[int]:
+        """The database catalog's row estimate for a table (None if unavailable), cached for SCHEMA_CACHE_TTL seconds."""
+        cached = self._reltuples_cache.get(table_name)
+        if cached and time.monotonic() - cached[0] < self.SCHEMA_CACHE_TTL:
+            return cached[1]
+        
+        count = None
+        dialect = self.engine.dialect.name
+        try:
+            # Static SQL goes straight to the DBAPI, skipping SQLAlchemy compilation
+            if dialect == 'postgresql':
+                # PostgreSQL's reltuples (very fast, approximate count). It is -1 on never-analyzed
+                # tables and 0 right after a TRUNCATE, so relpages and the declared row width come along
+                # to tell an empty table from an unanalyzed one without scanning it.
+                result = conn.exec_driver_sql(
+                    "SELECT GREATEST(c.reltuples, 0)::BIGINT, c.relpages,"
+                    " (SELECT COALESCE(SUM(CASE WHEN a.attlen > 0 THEN a.attlen ELSE 32 END), 0)"
+                    "  FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped)"
+                    " FROM pg_class c WHERE c.relname = %s",
+                    (table_name,),
+                )
+                row = result.first()
+                if row is not None:
+                    reltuples, relpages, row_width = (int(v or 0) for v in row)
+                    if reltuples > 0 or relpages == 0:
+                        count = reltuples
+                    else:
+                        # Pages on disk but no statistics: usable bytes per 8K page / (tuple header + line pointer + data)
+                        count = int(relpages * 8168 / (28 + max(row_width, 1)))
+            elif dialect in ('mysql', 'mariadb'):
+                # InnoDB's table_rows statistic (approximate, maintained without scanning)
+                row = conn.exec_driver_sql(
+                    "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                    (table_name,),
+                ).first()
+                if row is not None and row[0] is not None:
+                    count = int(row[0])
+            elif dialect == 'sqlite':
+                # ANALYZE statistics when present (first number of stat is the row count); without them there
+                # is no estimate (None), rather than a COUNT(*) full scan just to decide how to scan the table
+                has_stats = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+                ).scalar()
+                row = None
+                if has_stats:
+                    row = conn.exec_driver_sql("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).first()
+                if row is not None and row[0]:
+                    count = int(str(row[0]).split()[0])
+        except Exception as e:
+            log.warning("[Dashboard] Could not estimate rows for %s: %s", table_name, e)
+        self._reltuples_cache[table_name] = (time.monotonic(), count)
+        return count
     
     def _get_table_size_estimate(self, conn, table_name: str) -> int:
         """Get approximate table size quickly."""
         # Validate table name to prevent SQL injection
         if not self._validate_identifier(table_name):
-            print(f"[Dashboard] Invalid table name: {table_name}")
+            log.warning("[Dashboard] Invalid table name: %s", table_name)
             return 150000  # Default to medium-large table
         
-        try:
-            # Try PostgreSQL's reltuples (very fast, approximate count)
-            # Using parameterized query would be better, but relname needs to be in WHERE clause
-            # Since table_name is validated, it's safe
-            result = conn.execute(text(f"SELECT reltuples::BIGINT FROM pg_class WHERE relname = '{table_name}'"))
-            count = int(result.scalar() or 0)
-            if count > 0:
-                return count
-        except Exception as e:
-            print(f"[Dashboard] Could not get reltuples for {table_name}: {e}")
+        count = self._get_reltuples(conn, table_name)
+        if count is not None:
+            return count
+        if self.engine.dialect.name == 'sqlite':
+            # SQLite's random() sampling filter reads every row anyway, so an unknown size is treated as
+            # small: one full aggregate scan instead of a sampled scan plus an exact COUNT(*)
+            return 0
         
         # Fallback: assume it's a medium-sized table (will use LIMIT for safety)
         # We don't want to do COUNT(*) here as it can be very slow on large tables
         return 150000  # Default to medium-large table (will use LIMIT)
     
-    def _generate_metrics(self, primary_table: str, all_tables: List[str]) -> List[Dict]:
+    def _generate_metrics(self, ctx: SchemaCtx, conn=None) -> Dict[str, Any]:
         """Generate analytics overview metrics intelligently based on actual database schema."""
-        metrics = []
+        primary_table = ctx.table
+        metrics: Dict[str, Metric] = {}  # label -> metric card, in display order
+        revenue_value = purchase_value = loss_value = expenses_value_metric = None
+        purchase_col = None
         
         # Validate primary table name
         if not self._validate_identifier(primary_table):
-            print(f"[Dashboard] Invalid primary table name: {primary_table}")
-            return self._get_default_metrics()
+            log.warning("[Dashboard] Invalid primary table name: %s", primary_table)
+            return self._default_metrics_result()
         
         try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                # Validate all column names
-                columns = [col for col in columns if self._validate_identifier(col)]
-                column_types = {col['name']: str(col['type']) for col in columns_info if self._validate_identifier(col['name'])}
+            with self._connect(conn) as conn:
+                columns = ctx.columns
+                column_types = ctx.types  # keyed by the columns SchemaCtx already validated
                 
                 if not columns:
-                    print(f"[Dashboard] No valid columns found in table {primary_table}")
-                    return self._get_default_metrics()
+                    log.warning("[Dashboard] No valid columns found in table %s", primary_table)
+                    return self._default_metrics_result()
                 
-                # Get table size estimate to decide on query strategy
-                table_size = self._get_table_size_estimate(conn, primary_table)
-                use_limit = table_size > 100000  # Use LIMIT only for large tables
-                limit_value = 200000 if use_limit else None  # Increased limit for better accuracy
+                table_size = ctx.size
+                use_limit = ctx.use_limit
+                limit_value = ctx.limit_value
                 
-                print(f"[Dashboard] Table {primary_table} estimated size: {table_size}, using_limit: {use_limit}")
+                log.debug("[Dashboard] Table %s estimated size: %s, using_limit: %s", primary_table, table_size, use_limit)
                 
-                # Use knowledge base to understand column meanings
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
+                column_descriptions = ctx.column_descriptions
                 
-                print(f"[Dashboard] Available columns: {columns[:10]}...")  # Log first 10 columns
+                log.debug("[Dashboard] Available columns: %s...", columns[:10])  # Log first 10 columns
                 
                 # Intelligently find columns using knowledge base descriptions
-                date_col = self._find_column_smart(columns, column_descriptions, 
-                    ['date', 'created', 'timestamp', 'time', 'updated', 'modified'], 
-                    ['date', 'time', 'timestamp', 'datetime'])
+                date_col = self._role_col(ctx, "date")
                 
-                numeric_cols = self._find_numeric_columns(columns, column_types, column_descriptions)
-                status_col = self._find_column_smart(columns, column_descriptions,
-                    ['status', 'state', 'stock_status', 'condition', 'type'], 
-                    ['varchar', 'text', 'character'])
+                numeric_cols = ctx.numeric_cols
+                status_col = self._role_col(ctx, "status")
                 
                 # PRIORITY METRICS: Total Revenue, Total Purchases, Total Loss, Total Expenses
                 # Find relevant columns first
@@ -294,334 +719,133 @@ class DashboardGenerator:
                 expense_col = None  # Separate expense column (recurring expenses)
                 
                 for num_col in numeric_cols:
-                    col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                    col_lower = num_col.lower()
+                    # Name and description were lowercased once in SchemaCtx; one regex scan per category
+                    haystack = ctx.col_text[num_col]
                     
                     # Find revenue column (prioritize revenue, sales, income, then amount/price)
                     if not revenue_col:
-                        if any(word in col_desc or word in col_lower for word in ['revenue', 'sales', 'income']):
-                            revenue_col = num_col
-                        elif not revenue_col and any(word in col_desc or word in col_lower for word in ['amount', 'total', 'price', 'value']):
+                        if _REVENUE_RE.search(haystack):
                             revenue_col = num_col
                     
                     # Find purchase/order column
                     if not purchase_col:
-                        if any(word in col_desc or word in col_lower for word in ['purchase', 'order', 'transaction']):
-                            purchase_col = num_col
-                        elif any(word in col_desc or word in col_lower for word in ['quantity']):
+                        if _PURCHASE_RE.search(haystack):
                             purchase_col = num_col
                     
                     # Find expense column (recurring expenses, separate from loss)
-                    if not expense_col:
-                        expense_keywords = ['expense', 'operating', 'overhead']
-                        if any(word in col_desc or word in col_lower for word in expense_keywords):
-                            if 'expense' in col_lower or 'expense' in col_desc:
-                                expense_col = num_col
+                    if not expense_col and 'expense' in haystack:
+                        expense_col = num_col
                     
                     # Find cost/loss column (one-time losses, broader search)
                     if not cost_col:
-                        loss_keywords = ['loss', 'writeoff', 'bad debt', 'depreciation', 'discount', 'refund', 'return']
                         # Also check for cost if expense_col is not set
-                        if not expense_col:
-                            loss_keywords.extend(['cost', 'spent', 'outgoing', 'payment', 'fee', 'charge', 'debit', 'withdrawal', 'deduction'])
-                        if any(word in col_desc or word in col_lower for word in loss_keywords):
+                        loss_re = _LOSS_RE if expense_col else _LOSS_BROAD_RE
+                        if loss_re.search(haystack):
                             cost_col = num_col
                 
-                # Metric 1: Calculate Total Revenue
-                revenue_value = None
-                if revenue_col and self._validate_identifier(revenue_col):
-                    print(f"[Dashboard] Using revenue column: {revenue_col}")
-                    try:
-                        if use_limit and limit_value:
-                            # Use LIMIT for large tables
-                            sum_query = f"""
-                                SELECT SUM(\"{revenue_col}\") 
-                                FROM (
-                                    SELECT \"{revenue_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{revenue_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            # Full query for small tables
-                            sum_query = f"SELECT SUM(\"{revenue_col}\") FROM {primary_table} WHERE \"{revenue_col}\" IS NOT NULL"
-                        
-                        result = conn.execute(text(sum_query))
-                        revenue_value = result.scalar()
-                        print(f"[Dashboard] Revenue calculated: {revenue_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating revenue: {e}")
-                        revenue_value = None
-                else:
-                    print(f"[Dashboard] No revenue column found. Available numeric columns: {[c for c in numeric_cols[:5]]}")
-                
-                metrics.append({
-                    "label": "Total Revenue",
-                    "value": self._format_number(revenue_value) if revenue_value is not None and revenue_value > 0 else "0",
-                    "unit": "",
-                    "color": "#10b981",  # green
-                    "icon": "💰"
-                })
-                
-                # Metric 2: Calculate Total Purchases
-                purchase_value = None
-                if purchase_col and self._validate_identifier(purchase_col):
-                    print(f"[Dashboard] Using purchase column: {purchase_col}")
-                    try:
-                        if 'quantity' in purchase_col.lower():
-                            # Sum quantity column
-                            if use_limit and limit_value:
-                                sum_query = f"""
-                                    SELECT SUM(\"{purchase_col}\") 
-                                    FROM (
-                                        SELECT \"{purchase_col}\" 
-                                        FROM {primary_table} 
-                                        WHERE \"{purchase_col}\" IS NOT NULL 
-                                        LIMIT {limit_value}
-                                    ) subquery
-                                """
-                            else:
-                                sum_query = f"SELECT SUM(\"{purchase_col}\") FROM {primary_table} WHERE \"{purchase_col}\" IS NOT NULL"
-                            result = conn.execute(text(sum_query))
-                            purchase_value = result.scalar()
-                        else:
-                            # Count records
-                            if use_limit:
-                                # For large tables, use approximate count
-                                try:
-                                    count_query = f"SELECT reltuples::BIGINT FROM pg_class WHERE relname = '{primary_table}'"
-                                    result = conn.execute(text(count_query))
-                                    purchase_value = int(result.scalar() or 0)
-                                except Exception as e:
-                                    print(f"[Dashboard] Error in approximate count, using LIMIT fallback: {e}")
-                                    # Fallback: count with LIMIT
-                                    count_query = f"SELECT COUNT(*) FROM (SELECT 1 FROM {primary_table} LIMIT {limit_value}) subquery"
-                                    result = conn.execute(text(count_query))
-                                    purchase_value = result.scalar()
-                            else:
-                                # Full count for small tables
-                                count_query = f"SELECT COUNT(*) FROM {primary_table}"
-                                result = conn.execute(text(count_query))
-                                purchase_value = result.scalar()
-                        print(f"[Dashboard] Purchases calculated: {purchase_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating purchases: {e}")
-                        import traceback
-                        traceback.print_exc()
-                else:
-                    if purchase_col:
-                        print(f"[Dashboard] Purchase column '{purchase_col}' failed validation")
-                    else:
-                        print(f"[Dashboard] No purchase column found")
-                
-                # If no purchase column, use count
-                if purchase_value is None:
-                    print(f"[Dashboard] No purchase column, using row count")
-                    try:
-                        if use_limit:
-                            # Approximate count for large tables
-                            try:
-                                count_query = f"SELECT reltuples::BIGINT FROM pg_class WHERE relname = '{primary_table}'"
-                                result = conn.execute(text(count_query))
-                                purchase_value = int(result.scalar() or 0)
-                            except Exception as e:
-                                print(f"[Dashboard] Error in approximate count fallback: {e}")
-                                purchase_value = table_size  # Use estimate
-                        else:
-                            # Full count for small tables
-                            count_query = f"SELECT COUNT(*) FROM {primary_table}"
-                            result = conn.execute(text(count_query))
-                            purchase_value = result.scalar() or 0
-                    except Exception as e:
-                        print(f"[Dashboard] Error in purchase count fallback: {e}")
-                        purchase_value = 0
-                
-                metrics.append({
-                    "label": "Total Purchases",
-                    "value": self._format_number(purchase_value) if purchase_value else "0",
-                    "unit": "",
-                    "color": "#3b82f6",  # blue
-                    "icon": "🛒"
-                })
-                
-                # Metric 3: Calculate Total Loss (one-time losses)
-                loss_value = None
-                if cost_col and self._validate_identifier(cost_col):
-                    print(f"[Dashboard] Using loss column: {cost_col}")
-                    try:
-                        if use_limit and limit_value:
-                            loss_query = f"""
-                                SELECT SUM(\"{cost_col}\") 
-                                FROM (
-                                    SELECT \"{cost_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{cost_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            loss_query = f"SELECT SUM(\"{cost_col}\") FROM {primary_table} WHERE \"{cost_col}\" IS NOT NULL"
-                        
-                        result = conn.execute(text(loss_query))
-                        loss_value = result.scalar()
-                        print(f"[Dashboard] Loss calculated: {loss_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating loss: {e}")
-                        loss_value = None
-                else:
-                    if cost_col:
-                        print(f"[Dashboard] Loss column '{cost_col}' failed validation")
-                    print(f"[Dashboard] No loss column found")
-                
-                # Calculate Total Expenses (recurring expenses, separate from loss)
-                expenses_value_metric = None
-                if expense_col and self._validate_identifier(expense_col):
-                    print(f"[Dashboard] Using expense column: {expense_col}")
-                    try:
-                        if use_limit and limit_value:
-                            expense_query = f"""
-                                SELECT SUM(\"{expense_col}\") 
-                                FROM (
-                                    SELECT \"{expense_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{expense_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            expense_query = f"SELECT SUM(\"{expense_col}\") FROM {primary_table} WHERE \"{expense_col}\" IS NOT NULL"
-                        
-                        result = conn.execute(text(expense_query))
-                        expenses_value_metric = result.scalar()
-                        print(f"[Dashboard] Expenses calculated: {expenses_value_metric}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating expenses: {e}")
-                        expenses_value_metric = None
+                # Metrics 1-4: one aggregation statement (one scan, one round trip) for all sums
+                purchase_is_quantity = bool(purchase_col) and 'quantity' in purchase_col.lower()
+                aggregates = [
+                    (alias, col) for alias, col in (
+                        ("revenue", revenue_col),
+                        ("purchases", purchase_col if purchase_is_quantity else None),
+                        ("loss", cost_col),
+                        ("expenses", expense_col),
+                    ) if col in column_types
+                ]
+                log.debug("[Dashboard] Aggregating columns: %s", aggregates)
+                
+                totals = {}
+                try:
+                    # Core construct instead of an f-string so the engine's compiled-statement cache is reused
+                    tbl = ctx.sa_table
+                    # Negative revenue only stands in for loss when there is no cost column, so only sum it then
+                    neg_col = revenue_col if revenue_col in column_types and cost_col not in column_types else None
+                    if self.SUMMARY_MV_ENABLED and self.engine.dialect.name == 'postgresql':
+                        # Exact full-table sums precomputed in a materialized view, refreshed on a TTL
+                        mv_stmt = select(*self._metric_sums(tbl, aggregates, neg_col), func.count().label("row_count")).select_from(tbl)
+                        totals = self._read_summary_mv(conn, mv_stmt) or {}
+                    if not totals:
+                        source, scale = self._aggregate_source(ctx, [col for _, col in aggregates])
+                        extra = [func.count().label("row_count")]
+                        if use_limit and (self.EXACT_COUNTS or self._get_reltuples(conn, primary_table) is None):
+                            # Exact count requested, or no catalog estimate at all: scalar subquery, same round trip
+                            extra.append(select(func.count()).select_from(tbl).scalar_subquery().label("total_count"))
+                        stmt = select(*self._metric_sums(source, aggregates, neg_col, scale), *extra).select_from(source)
+                        totals = dict(conn.execute(stmt).mappings().one())
+                    if totals.get("total_count"):
+                        # Remember the exact count as this table's size so later builds skip the COUNT(*)
+                        self._reltuples_cache[primary_table] = (time.monotonic(), int(totals["total_count"]))
+                    log.debug("[Dashboard] Aggregates calculated: %s", totals)
+                except Exception as e:
+                    log.exception("[Dashboard] Error calculating aggregates: %s", e)
+                
+                revenue_value = totals.get("revenue")
+                loss_value = totals.get("loss")
+                expenses_value_metric = totals.get("expenses")
+                if not revenue_col:
+                    log.debug("[Dashboard] No revenue column found. Available numeric columns: %s", [c for c in numeric_cols[:5]])
+                
+                metrics["Total Revenue"] = Metric(
+                    label="Total Revenue",
+                    value=self._format_number(revenue_value) if revenue_value is not None and revenue_value > 0 else "0",
+                    unit="",
+                    color="#10b981",  # green
+                    icon="💰"
+                )
+                
+                # Row count: approximate count for large tables, exact count from the aggregate otherwise
+                row_count = totals.get("row_count") or 0
+                if use_limit:
+                    # Exact count fetched with the aggregates when there is one, else the cached catalog estimate
+                    row_count = totals.get("total_count") or self._get_reltuples(conn, primary_table) or 0
+                
+                # Metric 2: Total Purchases (sum of quantity, or record count)
+                if purchase_is_quantity:
+                    purchase_value = totals.get("purchases")
                 else:
-                    if expense_col:
-                        print(f"[Dashboard] Expense column '{expense_col}' failed validation")
-                    print(f"[Dashboard] No expense column found")
-                
-                # If no cost column but we have revenue, try to find any expense-related column
+                    if not purchase_col:
+                        log.debug("[Dashboard] No purchase column, using row count")
+                    purchase_value = row_count
+                log.debug("[Dashboard] Purchases calculated: %s", purchase_value)
+                
+                metrics["Total Purchases"] = Metric(
+                    label="Total Purchases",
+                    value=self._format_number(purchase_value) if purchase_value else "0",
+                    unit="",
+                    color="#3b82f6",  # blue
+                    icon="🛒"
+                )
+                
+                # Metric 3: Total Loss (one-time losses)
+                # If no cost column but we have revenue, use negative revenue values (returns/refunds)
                 if loss_value is None and revenue_value is not None:
-                    print(f"[Dashboard] No cost column found, searching for alternative expense columns...")
-                    # Try to find any expense-related column with broader search
-                    for num_col in numeric_cols:
-                        if num_col != revenue_col and self._validate_identifier(num_col):
-                            col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                            col_lower = num_col.lower()
-                            # Broader keyword matching
-                            expense_keywords = ['expense', 'cost', 'outgoing', 'spent', 'payment', 'fee', 'charge', 
-                                              'debit', 'withdrawal', 'deduction', 'discount', 'refund', 'return']
-                            if any(word in col_desc or word in col_lower for word in expense_keywords):
-                                print(f"[Dashboard] Found potential expense column: {num_col} (desc: {col_desc})")
-                                try:
-                                    if use_limit and limit_value:
-                                        loss_query = f"""
-                                            SELECT SUM(\"{num_col}\") 
-                                            FROM (
-                                                SELECT \"{num_col}\" 
-                                                FROM {primary_table} 
-                                                WHERE \"{num_col}\" IS NOT NULL 
-                                                LIMIT {limit_value}
-                                            ) subquery
-                                        """
-                                    else:
-                                        loss_query = f"SELECT SUM(\"{num_col}\") FROM {primary_table} WHERE \"{num_col}\" IS NOT NULL"
-                                    result = conn.execute(text(loss_query))
-                                    calculated_loss = result.scalar()
-                                    if calculated_loss and calculated_loss > 0:
-                                        loss_value = calculated_loss
-                                        print(f"[Dashboard] Successfully calculated loss from {num_col}: {loss_value}")
-                                        break
-                                except Exception as e:
-                                    print(f"[Dashboard] Error trying expense column {num_col}: {e}")
-                                    continue
-                    
-                    # If still no loss found, try looking for negative values in revenue column (returns/refunds)
-                    if loss_value is None or loss_value == 0:
-                        print(f"[Dashboard] Trying to find negative values in revenue column as expenses...")
-                        if revenue_col and self._validate_identifier(revenue_col):
-                            try:
-                                if use_limit and limit_value:
-                                    negative_query = f"""
-                                        SELECT ABS(SUM(\"{revenue_col}\")) 
-                                        FROM (
-                                            SELECT \"{revenue_col}\" 
-                                            FROM {primary_table} 
-                                            WHERE \"{revenue_col}\" < 0 
-                                            LIMIT {limit_value}
-                                        ) subquery
-                                    """
-                                else:
-                                    negative_query = f"SELECT ABS(SUM(\"{revenue_col}\")) FROM {primary_table} WHERE \"{revenue_col}\" < 0"
-                                result = conn.execute(text(negative_query))
-                                negative_sum = result.scalar()
-                                if negative_sum and negative_sum > 0:
-                                    loss_value = negative_sum
-                                    print(f"[Dashboard] Found negative values (returns/refunds) as loss: {loss_value}")
-                            except Exception as e:
-                                print(f"[Dashboard] Error checking negative values: {e}")
-                
-                metrics.append({
-                    "label": "Total Loss",
-                    "value": self._format_number(loss_value) if loss_value is not None and loss_value > 0 else "0",
-                    "unit": "",
-                    "color": "#ef4444",  # red
-                    "icon": "📉"
-                })
+                    negative_sum = totals.get("neg_revenue")
+                    if negative_sum and negative_sum > 0:
+                        loss_value = negative_sum
+                        log.debug("[Dashboard] Found negative values (returns/refunds) as loss: %s", loss_value)
+                
+                metrics["Total Loss"] = Metric(
+                    label="Total Loss",
+                    value=self._format_number(loss_value) if loss_value is not None and loss_value > 0 else "0",
+                    unit="",
+                    color="#ef4444",  # red
+                    icon="📉"
+                )
                 
                 # Metric 4: Total Records Count (always available)
-                try:
-                    # Use smart query strategy for large tables
-                    if use_limit and limit_value:
-                        # For large tables, use approximate count
-                        try:
-                            count_query = f"SELECT reltuples::BIGINT FROM pg_class WHERE relname = '{primary_table}'"
-                            result = conn.execute(text(count_query))
-                            total_count = int(result.scalar() or 0)
-                            if total_count == 0:
-                                # Fallback to actual count if estimate is 0
-                                count_query = f"SELECT COUNT(*) FROM {primary_table}"
-                                result = conn.execute(text(count_query))
-                                total_count = result.scalar() or 0
-                        except Exception as e:
-                            print(f"[Dashboard] Error in approximate count, using full count: {e}")
-                            count_query = f"SELECT COUNT(*) FROM {primary_table}"
-                            result = conn.execute(text(count_query))
-                            total_count = result.scalar() or 0
-                    else:
-                        # Full count for small tables
-                        count_query = f"SELECT COUNT(*) FROM {primary_table}"
-                        result = conn.execute(text(count_query))
-                        total_count = result.scalar() or 0
-                    
-                    print(f"[Dashboard] Total Records calculated: {total_count}")
-                    metrics.append({
-                        "label": "Total Records",
-                        "value": f"{total_count:,}",
-                        "unit": "",
-                        "color": "#8b5cf6",  # purple
-                        "icon": "📊"
-                    })
-                except Exception as e:
-                    print(f"[Dashboard] Error getting total count: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    metrics.append({
-                        "label": "Total Records",
-                        "value": "0",
-                        "unit": "",
-                        "color": "#8b5cf6",
-                        "icon": "📊"
-                    })
+                log.debug("[Dashboard] Total Records calculated: %s", row_count)
+                metrics["Total Records"] = Metric(
+                    label="Total Records",
+                    value=f"{row_count:,}",
+                    unit="",
+                    color="#8b5cf6",  # purple
+                    icon="📊"
+                )
                 
                 
         except Exception as e:
-            print(f"Error generating metrics: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error generating metrics: %s", e)
         
         # Calculate profit from the values we have
         profit_value = None
@@ -634,23 +858,11 @@ class DashboardGenerator:
         # Ensure we have exactly 4 metrics
         # We should already have 4 metrics from above, but just in case
         if len(metrics) < 4:
-            metric_labels = ["Total Revenue", "Total Purchases", "Total Loss", "Total Records"]
-            metric_colors = ["#2dd4bf", "#60a5fa", "#fb923c", "#a78bfa", "#f472b6", "#4ade80"]
-            metric_icons = ["💰", "🛒", "📉", "📊"]
-            
-            existing_labels = [m.get("label", "") for m in metrics]
-            for idx in range(4):
+            for label, color, icon in _BASE_METRICS:
                 if len(metrics) >= 4:
                     break
-                label = metric_labels[idx]
-                if label not in existing_labels:
-                    metrics.append({
-                        "label": label,
-                        "value": "0",
-                        "unit": "",
-                        "color": metric_colors[idx],
-                        "icon": metric_icons[idx]
-                    })
+                if label not in metrics:
+                    metrics[label] = Metric(label, "0", "", color, icon)
         
         # Return both formatted metrics and raw values for pie chart
         # CRITICAL: Ensure loss_value is properly converted to float (not None)
@@ -659,46 +871,47 @@ class DashboardGenerator:
         expenses_value_final = float(expenses_value_metric or 0) if expenses_value_metric is not None else 0.0
         profit_value_final = float(profit_value or 0) if profit_value is not None else 0.0
         
-        print(f"[Dashboard] Returning metric values - Revenue: {revenue_value_final}, Expenses: {expenses_value_final}, Loss: {loss_value_final}, Profit: {profit_value_final}")
-        print(f"[Dashboard] Loss value check - Original: {loss_value}, Final: {loss_value_final}, Type: {type(loss_value_final)}, > 0: {loss_value_final > 0}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("[Dashboard] Returning metric values - Revenue: %s, Expenses: %s, Loss: %s, Profit: %s", revenue_value_final, expenses_value_final, loss_value_final, profit_value_final)
+            log.debug("[Dashboard] Loss value check - Original: %s, Final: %s, Type: %s, > 0: %s", loss_value, loss_value_final, type(loss_value_final), loss_value_final > 0)
         
         # Add additional metrics: Receipt count, Quantity, Cost, Unsold Items %
         # Metric 5: Receipt/Order count
         receipt_count = purchase_value if purchase_value else 0
-        metrics.append({
-            "label": "Receipt",
-            "value": self._format_number(receipt_count),
-            "unit": "",
-            "color": "#ef4444",
-            "icon": "📄"
-        })
+        metrics["Receipt"] = Metric(
+            label="Receipt",
+            value=self._format_number(receipt_count),
+            unit="",
+            color="#ef4444",
+            icon="📄"
+        )
         
         # Metric 6: Quantity (if available)
         quantity_value = purchase_value if purchase_col and 'quantity' in purchase_col.lower() else 0
-        metrics.append({
-            "label": "Quantity",
-            "value": self._format_number(quantity_value),
-            "unit": "",
-            "color": "#8b5cf6",
-            "icon": "🛒"
-        })
+        metrics["Quantity"] = Metric(
+            label="Quantity",
+            value=self._format_number(quantity_value),
+            unit="",
+            color="#8b5cf6",
+            icon="🛒"
+        )
         
         # Metric 7: Cost (expenses + loss)
         cost_total = expenses_value_final + loss_value_final
-        metrics.append({
-            "label": "Cost",
-            "value": self._format_number(cost_total),
-            "unit": "",
-            "color": "#f59e0b",
-            "icon": "💰"
-        })
+        metrics["Cost"] = Metric(
+            label="Cost",
+            value=self._format_number(cost_total),
+            unit="",
+            color="#f59e0b",
+            icon="💰"
+        )
         
         # Metric 8: Unsold Items % (will be calculated dynamically)
         # For now, set a placeholder - will be calculated from unsold items
         unsold_percentage = 0.0
         
         return {
-            "metrics": metrics[:6],  # Return exactly 6 metrics (Revenue, Purchases, Loss, Profit, Receipt, Quantity)
+            "metrics": metrics,  # First 6 are displayed (Revenue, Purchases, Loss, Profit, Receipt, Quantity)
             "values": {
                 "revenue": revenue_value_final,
                 "expenses": expenses_value_final,
@@ -707,81 +920,147 @@ class DashboardGenerator:
             }
         }
     
-    def _find_column_smart(self, columns: List[str], column_descriptions: Dict, 
-                          keywords: List[str], type_hints: List[str] = None) -> Optional[str]:
-        """Intelligently find column using both name and description."""
+    def _metric_sums(self, source, aggregates: List[tuple], neg_col: Optional[str], scale: Optional[float] = None) -> List:
+        """Labelled SUM expressions for the metric aggregate, optionally scaled up from a sample."""
+        sums = [func.sum(source.c[col]) for _, col in aggregates]
+        labels = [alias for alias, _ in aggregates]
+        if neg_col:
+            # Negative revenue (returns/refunds) on the same scan, used as loss when there is no cost column
+            rev = source.c[neg_col]
+            sums.append(func.abs(func.coalesce(func.sum(case((rev < 0, rev))), 0)))
+            labels.append("neg_revenue")
+        return [(expr * scale if scale else expr).label(alias) for expr, alias in zip(sums, labels)]
+    
+    def _refresh_mv(self, conn, name: str, sql: str, key: str, extra_index: str = None):
+        """Create the materialized view `name` over `sql`, or refresh it once SUMMARY_MV_TTL seconds have passed."""
+        refreshed = self._summary_mvs.get(name)
+        if refreshed is not None and time.monotonic() - refreshed < self.SUMMARY_MV_TTL:
+            return
+        exists = conn.exec_driver_sql("SELECT 1 FROM pg_matviews WHERE matviewname = %s", (name,)).scalar()
+        if exists:
+            conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}")
+        else:
+            conn.exec_driver_sql(f"CREATE MATERIALIZED VIEW {name} AS {sql}")
+            # A unique index is what allows REFRESH ... CONCURRENTLY (readers are never blocked)
+            conn.exec_driver_sql(f"CREATE UNIQUE INDEX {name}_key ON {name} ({key})")
+            if extra_index:
+                conn.exec_driver_sql(f"CREATE INDEX {name}_ord ON {name} ({extra_index})")
+        conn.commit()
+        self._summary_mvs[name] = time.monotonic()
+    
+    def _read_summary_mv(self, conn, stmt) -> Optional[Dict[str, Any]]:
+        """Read the metric aggregate from a materialized view, creating or refreshing it every SUMMARY_MV_TTL seconds."""
+        sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+        name = "dash_mv_" + hashlib.md5(sql.encode()).hexdigest()[:12]
+        try:
+            self._refresh_mv(conn, name, f"SELECT 1 AS mv_key, s.* FROM ({sql}) s", "mv_key")
+            row = conn.exec_driver_sql(f"SELECT * FROM {name}").mappings().one()
+            return {k: v for k, v in row.items() if k != "mv_key"}
+        except Exception as e:
+            log.warning("[Dashboard] Summary view unavailable, using live query: %s", e)
+            conn.rollback()
+            return None
+    
+    def _read_top_mv(self, conn, table_name: str, name_col: str, metric_col: str) -> Optional[List]:
+        """Top 10 (name, total) rows from a per-name totals view indexed on total_sales DESC."""
+        name = "dash_mv_top_" + hashlib.md5(f"{table_name}|{name_col}|{metric_col}".encode()).hexdigest()[:12]
+        sql = (
+            f'SELECT "{name_col}" AS product_name, SUM("{metric_col}") AS total_sales FROM {table_name} '
+            f'WHERE "{name_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL GROUP BY "{name_col}"'
+        )
+        try:
+            self._refresh_mv(conn, name, sql, "product_name", "total_sales DESC")
+            # Ordered index scan: reads exactly 10 index entries instead of aggregating and sorting every group
+            return conn.exec_driver_sql(
+                f"SELECT product_name, total_sales FROM {name} ORDER BY total_sales DESC LIMIT 10"
+            ).fetchall()
+        except Exception as e:
+            log.warning("[Dashboard] Top-selling view unavailable, using live query: %s", e)
+            conn.rollback()
+            return None
+    
+    def _find_column_smart(self, ctx: SchemaCtx, keywords: List[str], type_hints: List[str] = None) -> Optional[str]:
+        """Intelligently find column using both name and description (memoized on the schema context)."""
+        key = tuple(keywords)
+        if key in ctx.column_matches:
+            return ctx.column_matches[key]
+        
+        match = None
         # First try exact keyword match
         for keyword in keywords:
-            for col in columns:
-                if keyword.lower() in col.lower():
-                    return col
+            keyword = keyword.lower()
+            match = next((col for col, col_lower in ctx.lower_names if keyword in col_lower), None)
+            if match:
+                break
         
         # Then try description match
-        for col, col_info in column_descriptions.items():
-            if col in columns:
-                desc = col_info.get('description', '').lower()
-                for keyword in keywords:
-                    if keyword in desc:
-                        return col
+        if match is None:
+            for col in ctx.column_descriptions:
+                desc = ctx.desc_lc.get(col)
+                if desc is not None and any(keyword in desc for keyword in keywords):
+                    match = col
+                    break
         
-        return None
+        ctx.column_matches[key] = match
+        return match
+    
+    def _role_col(self, ctx: SchemaCtx, role: str) -> Optional[str]:
+        """Column playing `role` (a _ROLE_KEYWORDS key) in the table, resolved once per schema context."""
+        return self._find_column_smart(ctx, _ROLE_KEYWORDS[role])
     
     def _find_numeric_columns(self, columns: List[str], column_types: Dict, 
                              column_descriptions: Dict) -> List[str]:
         """Find all numeric columns."""
         numeric_cols = []
-        numeric_types = ['integer', 'int', 'bigint', 'smallint', 'numeric', 'decimal', 
-                        'real', 'double', 'float', 'money']
-        
         for col in columns:
             col_type = column_types.get(col, '').lower()
-            if any(nt in col_type for nt in numeric_types):
+            if any(nt in col_type for nt in _NUMERIC_TYPES):
                 # Skip ID columns
-                if 'id' not in col.lower() or col.lower() == 'id':
+                col_lower = col.lower()
+                if 'id' not in col_lower or col_lower == 'id':
                     numeric_cols.append(col)
         
         return numeric_cols
     
-    def _get_today_count(self, conn, table: str, date_col: str, col_type: str) -> Optional[int]:
-        """Get count of records from today."""
-        # Validate identifiers
-        if not self._validate_identifier(table) or not self._validate_identifier(date_col):
-            return None
-        
-        queries = [
-            f"SELECT COUNT(*) FROM {table} WHERE DATE(\"{date_col}\") = CURRENT_DATE",
-            f"SELECT COUNT(*) FROM {table} WHERE \"{date_col}\"::date = CURRENT_DATE",
-            f"SELECT COUNT(*) FROM {table} WHERE \"{date_col}\" >= CURRENT_DATE::date AND \"{date_col}\" < (CURRENT_DATE + INTERVAL '1 day')::date",
-        ]
+    def _get_stmts(self, kind: str, table: str, col: str) -> tuple:
+        """Compiled text() statements for one SQL_TEMPLATES entry, built once per (kind, table, column)."""
+        key = (kind, table, col)
+        stmts = self._stmt_cache.get(key)
+        if stmts is None:
+            stmts = tuple(text(t.format(table=table, col=col)) for t in self.SQL_TEMPLATES[kind])
+            self._stmt_cache[key] = stmts
+        return stmts
+    
+    def _count_with_fallbacks(self, conn, kind: str, table: str, col: str) -> Optional[int]:
+        """Run the first SQL_TEMPLATES variant that works, trying the one that last succeeded first."""
+        stmts = self._get_stmts(kind, table, col)
+        key = (kind, table, col)
+        preferred = self._date_query_pref.get(key, 0)
+        order = [preferred] + [i for i in range(len(stmts)) if i != preferred]
         
-        for query in queries:
+        for idx in order:
             try:
-                result = conn.execute(text(query))
+                result = conn.execute(stmts[idx])
+                self._date_query_pref[key] = idx
                 return result.scalar()
             except Exception as e:
-                print(f"[Dashboard] Error in today count query: {e}")
+                log.warning("[Dashboard] Error in %s query: %s", kind.replace('_', ' '), e)
                 continue
         return None
     
+    def _get_today_count(self, conn, table: str, date_col: str, col_type: str) -> Optional[int]:
+        """Get count of records from today."""
+        # Validate identifiers
+        if not self._validate_identifier(table) or not self._validate_identifier(date_col):
+            return None
+        return self._count_with_fallbacks(conn, "today_count", table, date_col)
+    
     def _get_week_count(self, conn, table: str, date_col: str, col_type: str) -> Optional[int]:
         """Get count of records from last 7 days."""
         # Validate identifiers
         if not self._validate_identifier(table) or not self._validate_identifier(date_col):
             return None
-        
-        queries = [
-            f"SELECT COUNT(*) FROM {table} WHERE \"{date_col}\" >= CURRENT_DATE - INTERVAL '7 days'",
-            f"SELECT COUNT(*) FROM {table} WHERE \"{date_col}\"::date >= CURRENT_DATE - INTERVAL '7 days'",
-        ]
-        
-        for query in queries:
-            try:
-                result = conn.execute(text(query))
-                return result.scalar()
-            except Exception as e:
-                print(f"[Dashboard] Error in week count query: {e}")
-                continue
-        return None
+        return self._count_with_fallbacks(conn, "week_count", table, date_col)
     
     def _get_status_counts(self, conn, table: str, status_col: str) -> Dict[str, int]:
         """Get counts by status."""
@@ -790,11 +1069,10 @@ class DashboardGenerator:
             return {}
         
         try:
-            query = f"SELECT \"{status_col}\", COUNT(*) as count FROM {table} GROUP BY \"{status_col}\" ORDER BY count DESC LIMIT 5"
-            result = conn.execute(text(query))
+            result = conn.execute(self._get_stmts("status_counts", table, status_col)[0])
             return {row[0]: row[1] for row in result if row[0]}
         except Exception as e:
-            print(f"[Dashboard] Error getting status counts: {e}")
+            log.warning("[Dashboard] Error getting status counts: %s", e)
             return {}
     
     def _get_date_metric_label(self, date_col: str, description: str) -> str:
@@ -834,42 +1112,21 @@ class DashboardGenerator:
     
     def _format_number(self, value: float) -> str:
         """Format number for display."""
-        if value >= 1000000:
-            return f"{value/1000000:.1f}M"
-        elif value >= 1000:
-            return f"{value/1000:.1f}K"
-        else:
-            return f"{int(value):,}"
+        for divisor, suffix in _NUMBER_SUFFIXES:
+            if value >= divisor:
+                return f"{value / divisor:.1f}{suffix}"
+        return format(value if type(value) is int else int(value), ',')
     
-    def _generate_top_selling_products(self, primary_table: str, all_tables: List[str]) -> Dict:
+    def _generate_top_selling_products(self, ctx: SchemaCtx, conn=None) -> Dict:
         """Generate top selling products chart data."""
-        # Default empty chart
-        default_chart = {
-            "data": [{
-                "type": "bar",
-                "orientation": "h",
-                "x": [],
-                "y": [],
-                "marker": {"color": "#10b981"}
-            }],
-            "layout": {
-                "title": "Top Selling Products",
-                "xaxis": {"title": "Total Sales"},
-                "yaxis": {"title": "Product"},
-                "height": 400
-            }
-        }
+        primary_table = ctx.table
         
         try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                column_types = {col['name']: str(col['type']) for col in columns_info}
-                
-                # Use knowledge base to understand column meanings
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
+            with self._connect(conn) as conn:
+                columns = ctx.columns
+                use_limit = ctx.use_limit
+                limit_value = ctx.limit_value
+                sample = self._sample_clause(ctx)
                 
                 # Find product name column - EXCLUDE person/customer names
                 # First, try to find product-specific columns
@@ -878,11 +1135,11 @@ class DashboardGenerator:
                 # Priority 1: Product-specific columns
                 product_keywords = ['product_name', 'item_name', 'product', 'item', 'title', 'product_title']
                 for keyword in product_keywords:
-                    for col in columns:
-                        if keyword.lower() in col.lower():
-                            col_desc = column_descriptions.get(col, {}).get('description', '').lower()
+                    for col, col_lower in ctx.lower_names:
+                        if keyword in col_lower:
+                            col_desc = ctx.desc_lc[col]
                             # Exclude if it's clearly a person/customer name
-                            if not any(word in col_desc for word in ['customer', 'person', 'user', 'client', 'buyer', 'purchaser']):
+                            if not _PERSON_RE.search(col_desc):
                                 name_col = col
                                 break
                     if name_col:
@@ -890,208 +1147,89 @@ class DashboardGenerator:
                 
                 # Priority 2: Generic name column, but exclude person-related
                 if not name_col:
-                    for col in columns:
-                        col_type = column_types.get(col, '').lower()
-                        if 'varchar' in col_type or 'text' in col_type or 'character' in col_type:
-                            col_desc = column_descriptions.get(col, {}).get('description', '').lower()
-                            col_lower = col.lower()
-                            
+                    for col, col_lower in ctx.lower_names:
+                        if _TEXT_TYPE_RE.search(ctx.type_lc[col]):
                             # Skip if it's clearly a person/customer name
-                            if any(word in col_lower or word in col_desc for word in ['customer', 'person', 'user', 'client', 'buyer', 'purchaser', 'first_name', 'last_name', 'full_name']):
+                            if _PERSON_RE.search(ctx.col_text[col]):
                                 continue
                             
                             # Prefer columns that might be product names
-                            if any(word in col_lower for word in ['name', 'title']):
+                            if _NAME_TITLE_RE.search(col_lower):
                                 name_col = col
                                 break
                 
                 # Find quantity/sales column
                 quantity_col = None
                 amount_col = None
-                numeric_cols = self._find_numeric_columns(columns, column_types, column_descriptions)
+                numeric_cols = ctx.numeric_cols
                 
                 for num_col in numeric_cols:
-                    col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                    col_lower = num_col.lower()
+                    haystack = ctx.col_text[num_col]
                     
                     # Find quantity column
-                    if not quantity_col and any(word in col_desc or word in col_lower for word in ['quantity', 'qty', 'sold', 'sales', 'count']):
+                    if not quantity_col and _QUANTITY_RE.search(haystack):
                         quantity_col = num_col
                     
                     # Find amount/revenue column
-                    if not amount_col and any(word in col_desc or word in col_lower for word in ['amount', 'revenue', 'total', 'price', 'value']):
+                    if not amount_col and _AMOUNT_RE.search(haystack):
                         amount_col = num_col
                 
                 # If we have a name column, group by it
-                if name_col and self._validate_identifier(name_col):
+                if name_col:
                     # Determine which metric to use (quantity or amount)
                     metric_col = quantity_col if quantity_col else amount_col
                     
-                    if metric_col and self._validate_identifier(metric_col):
-                        # Get table size for query strategy
-                        table_size = self._get_table_size_estimate(conn, primary_table)
-                        use_limit = table_size > 100000
-                        limit_value = 200000 if use_limit else None
-                        
-                        if use_limit and limit_value:
-                            # Group by product name and sum the metric (with LIMIT for large tables)
-                            query = f"""
-                                SELECT 
-                                    "{name_col}" as product_name,
-                                    SUM("{metric_col}") as total_sales
-                                FROM (
-                                    SELECT "{name_col}", "{metric_col}"
-                                    FROM {primary_table}
-                                    WHERE "{name_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL
-                                    LIMIT {limit_value}
-                                ) subquery
-                                GROUP BY "{name_col}"
-                                ORDER BY total_sales DESC
-                                LIMIT 10
-                            """
-                        else:
-                            # Full query for small tables
-                            query = f"""
-                                SELECT 
-                                    "{name_col}" as product_name,
-                                    SUM("{metric_col}") as total_sales
-                                FROM {primary_table}
-                                WHERE "{name_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL
-                                GROUP BY "{name_col}"
-                                ORDER BY total_sales DESC
-                                LIMIT 10
-                            """
-                    else:
-                        # Just count by product name (no metric column available)
-                        if not self._validate_identifier(name_col):
-                            return default_chart
-                        
-                        # Get table size for query strategy
-                        table_size = self._get_table_size_estimate(conn, primary_table)
-                        use_limit = table_size > 100000
-                        limit_value = 200000 if use_limit else None
-                        
-                        if use_limit and limit_value:
-                            # Just count by product name (with LIMIT for large tables)
-                            query = f"""
-                                SELECT 
-                                    "{name_col}" as product_name,
-                                    COUNT(*) as total_sales
-                                FROM (
-                                    SELECT "{name_col}"
-                                    FROM {primary_table}
-                                    WHERE "{name_col}" IS NOT NULL
-                                    LIMIT {limit_value}
-                                ) subquery
-                                GROUP BY "{name_col}"
-                                ORDER BY total_sales DESC
-                                LIMIT 10
-                            """
-                        else:
-                            # Full query for small tables
-                            query = f"""
-                                SELECT 
-                                    "{name_col}" as product_name,
-                                    COUNT(*) as total_sales
-                                FROM {primary_table}
-                                WHERE "{name_col}" IS NOT NULL
-                                GROUP BY "{name_col}"
-                                ORDER BY total_sales DESC
-                                LIMIT 10
-                            """
+                    if metric_col:
+                        if self.AUTO_INDEX_ENABLED and self.engine.dialect.name == 'postgresql':
+                            self._ensure_partial_index(primary_table, name_col, metric_col)
+                        if self.SUMMARY_MV_ENABLED and self.engine.dialect.name == 'postgresql':
+                            # Exact full-table totals, precomputed per product and read back in total_sales order
+                            rows = self._read_top_mv(conn, primary_table, name_col, metric_col)
+                            if rows:
+                                return self._top_selling_chart(rows)
                     
-                    df = pd.read_sql(query, conn)
+                    # Sum the metric per product, or just count rows per product when no metric column exists
+                    stmt, params = self._top_agg_stmt(ctx, name_col, metric_col, sample)
                     
-                    if not df.empty:
-                        # Create horizontal bar chart data
-                        return {
-                            "data": [{
-                                "type": "bar",
-                                "orientation": "h",
-                                "x": df['total_sales'].tolist(),
-                                "y": df['product_name'].tolist(),
-                                "marker": {
-                                    "color": "#10b981"
-                                },
-                                "text": df['total_sales'].tolist(),
-                                "textposition": "outside"
-                            }],
-                            "layout": {
-                                "title": "Top Selling Products",
-                                "xaxis": {"title": "Total Sales"},
-                                "yaxis": {"title": "Product", "autorange": "reversed"},
-                                "height": 400,
-                                "margin": {"l": 150, "r": 50, "t": 50, "b": 50}
-                            }
-                        }
+                    # At most TOP_SELLING_LIMIT rows: fetch straight from the cursor, no DataFrame needed
+                    rows = conn.execute(stmt, params).fetchall()
+                    
+                    if rows:
+                        return self._top_selling_chart(rows)
                 
                 # Fallback: If no name column, try to find category/type (but not person names)
                 category_col = None
-                for col in columns:
-                    col_type = column_types.get(col, '').lower()
-                    if 'varchar' in col_type or 'text' in col_type or 'character' in col_type:
-                        col_lower = col.lower()
-                        col_desc = column_descriptions.get(col, {}).get('description', '').lower()
-                        
+                for col, col_lower in ctx.lower_names:
+                    if _TEXT_TYPE_RE.search(ctx.type_lc[col]):
                         # Skip person/customer columns
-                        if any(word in col_lower or word in col_desc for word in ['customer', 'person', 'user', 'client', 'buyer', 'purchaser', 'first_name', 'last_name', 'full_name']):
+                        if _PERSON_RE.search(ctx.col_text[col]):
                             continue
                         
                         # Look for category/type columns
-                        if any(word in col_lower for word in ['category', 'type', 'status', 'brand', 'model']):
+                        if _CATEGORY_RE.search(col_lower):
                             category_col = col
                             break
                 
                 # Re-determine metric_col for fallback
                 metric_col = quantity_col if quantity_col else amount_col
                 
-                if category_col and metric_col and self._validate_identifier(category_col) and self._validate_identifier(metric_col):
-                    # Get table size for query strategy
-                    table_size = self._get_table_size_estimate(conn, primary_table)
-                    use_limit = table_size > 100000
-                    limit_value = 200000 if use_limit else None
-                    
-                    if use_limit and limit_value:
-                        query = f"""
-                            SELECT 
-                                "{category_col}" as category,
-                                SUM("{metric_col}") as total_sales
-                            FROM (
-                                SELECT "{category_col}", "{metric_col}"
-                                FROM {primary_table}
-                                WHERE "{category_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL
-                                LIMIT {limit_value}
-                            ) subquery
-                            GROUP BY "{category_col}"
-                            ORDER BY total_sales DESC
-                            LIMIT 10
-                        """
-                    else:
-                        query = f"""
-                            SELECT 
-                                "{category_col}" as category,
-                                SUM("{metric_col}") as total_sales
-                            FROM {primary_table}
-                            WHERE "{category_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL
-                            GROUP BY "{category_col}"
-                            ORDER BY total_sales DESC
-                            LIMIT 10
-                        """
-                    df = pd.read_sql(query, conn)
+                if category_col and metric_col:
+                    stmt, params = self._top_agg_stmt(ctx, category_col, metric_col, sample)
+                    rows = conn.execute(stmt, params).fetchall()
                     
-                    if not df.empty:
+                    if rows:
                         # Assign different light colors to each bar
-                        num_bars = len(df)
-                        bar_colors = [self.BAR_CHART_COLORS[i % len(self.BAR_CHART_COLORS)] for i in range(num_bars)]
+                        bar_colors = self._BAR_PALETTE[:len(rows)]
+                        sales = [r[1] for r in rows]
                         
                         return {
                             "data": [{
                                 "type": "bar",
                                 "orientation": "h",
-                                "x": df['total_sales'].tolist(),
-                                "y": df['category'].tolist(),
+                                "x": sales,
+                                "y": [r[0] for r in rows],
                                 "marker": {"color": bar_colors},
-                                "text": df['total_sales'].tolist(),
+                                "text": sales,
                                 "textposition": "outside"
                             }],
                             "layout": {
@@ -1104,13 +1242,97 @@ class DashboardGenerator:
                         }
                 
                 # Final fallback: return empty chart
-                return default_chart
+                return copy.deepcopy(self._EMPTY_TOP_SELLING)
                 
         except Exception as e:
-            print(f"Error generating top selling products: {e}")
-            import traceback
-            traceback.print_exc()
-            return default_chart
+            log.exception("Error generating top selling products: %s", e)
+            return copy.deepcopy(self._EMPTY_TOP_SELLING)
+    
+    def _top_agg_stmt(self, ctx: SchemaCtx, label_col: str, metric_col: Optional[str], sample: Optional[tuple]) -> tuple:
+        """(text(), params) for the top TOP_SELLING_LIMIT "label, total_sales" rows of ctx.table.
+        
+        Sums metric_col per label (counts rows when it is None) over the TABLESAMPLE, the first
+        limit_value rows or the whole table. The statement is built once per table, columns and
+        sampling mode with both LIMITs bound, so repeated builds send identical SQL.
+        """
+        limited = not sample and ctx.use_limit and ctx.limit_value
+        key = ("top_agg", ctx.table, (label_col, metric_col, sample, bool(limited)))
+        stmt = self._stmt_cache.get(key)
+        if stmt is None:
+            agg = f'SUM("{metric_col}")' if metric_col else 'COUNT(*)'
+            where = f'"{label_col}" IS NOT NULL' + (f' AND "{metric_col}" IS NOT NULL' if metric_col else '')
+            if sample:
+                # Large PostgreSQL table: page-level sample, totals scaled to the whole table
+                agg = f'{agg} * {sample[1]}' if metric_col else f'ROUND({agg} * {sample[1]})'
+                source = f'{ctx.table} {sample[0]}'
+            elif limited:
+                cols = f'"{label_col}", "{metric_col}"' if metric_col else f'"{label_col}"'
+                source = f'(SELECT {cols} FROM {ctx.table} WHERE {where} LIMIT :sample_rows) subquery'
+                where = None
+            else:
+                source = ctx.table
+            stmt = self._stmt_cache[key] = text(f"""
+                SELECT "{label_col}" AS label, {agg} AS total_sales
+                FROM {source}
+                {f"WHERE {where}" if where else ""}
+                GROUP BY "{label_col}"
+                ORDER BY total_sales DESC
+                LIMIT :top
+            """)
+        params = {"top": self.TOP_SELLING_LIMIT}
+        if limited:
+            params["sample_rows"] = ctx.limit_value
+        return stmt, params
+    
+    def _top_selling_chart(self, rows: List) -> Dict:
+        """Horizontal bar chart for (product name, total sales) rows."""
+        sales = [r[1] for r in rows]
+        return {
+            "data": [{
+                "type": "bar",
+                "orientation": "h",
+                "x": sales,
+                "y": [r[0] for r in rows],
+                "marker": {
+                    "color": "#10b981"
+                },
+                "text": sales,
+                "textposition": "outside"
+            }],
+            "layout": {
+                "title": "Top Selling Products",
+                "xaxis": {"title": "Total Sales"},
+                "yaxis": {"title": "Product", "autorange": "reversed"},
+                "height": 400,
+                "margin": {"l": 150, "r": 50, "t": 50, "b": 50}
+            }
+        }
+    
+    def _ensure_partial_index(self, table_name: str, name_col: str, metric_col: str):
+        """Build, once per process and in the background, a partial index covering the top-selling GROUP BY."""
+        key = (table_name, name_col, metric_col)
+        with self._index_lock:
+            if key in self._indexed_tables:
+                return
+            # Marked before the build so a failing CREATE INDEX is not retried on every dashboard
+            self._indexed_tables.add(key)
+        
+        index_name = "idx_dash_" + hashlib.md5("|".join(key).encode()).hexdigest()[:12]
+        ddl = (
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ("{name_col}", "{metric_col}") '
+            f'WHERE "{name_col}" IS NOT NULL AND "{metric_col}" IS NOT NULL'
+        )
+        
+        def build():
+            try:
+                # CONCURRENTLY cannot run inside a transaction block, and does not block writers
+                with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    conn.exec_driver_sql(ddl)
+                log.debug("[Dashboard] Partial index %s ready on %s", index_name, table_name)
+            except Exception as e:
+                log.warning("[Dashboard] Could not create index %s on %s: %s", index_name, table_name, e)
+        
+        threading.Thread(target=build, daemon=True).start()
     
     def _generate_pie_chart_from_metrics(self, metric_values: Dict[str, float]) -> Dict:
         """Generate pie chart directly from metrics values (ensures consistency).
@@ -1123,136 +1345,27 @@ class DashboardGenerator:
         
         Note: Profit = Revenue - Expenses - Loss, so we show all components for transparency.
         """
-        # Convert all values to float, handling None and 0 properly
-        revenue_value = float(metric_values.get("revenue", 0) or 0)
-        expenses_value = float(metric_values.get("expenses", 0) or 0)
-        loss_value = float(metric_values.get("loss", 0) or 0)
-        profit_value = float(metric_values.get("profit", 0) or 0)
-        
-        print(f"[Dashboard] Generating pie chart from metrics - Revenue: {revenue_value}, Expenses: {expenses_value}, Loss: {loss_value}, Profit: {profit_value}")
-        print(f"[Dashboard] Loss value type: {type(loss_value)}, value: {loss_value}, > 0 check: {loss_value > 0}")
-        
-        # Build pie chart data - only include segments with values > 0
-        pie_values = []
-        pie_labels = []
-        pie_colors = []
-        
-        # Color scheme: Revenue (light teal), Expenses (light purple), Loss (light orange), Profit (light blue)
-        colors_map = {
-            "Revenue": "#2dd4bf",    # light teal
-            "Expenses": "#a78bfa",   # light purple
-            "Loss": "#fb923c",       # light orange
-            "Profit": "#60a5fa"      # light blue
-        }
-        
-        # Pie chart structure: Show all financial components
-        # - Revenue (total income)
-        # - Expenses (recurring costs, if any)
-        # - Loss (one-time losses, ALWAYS shown if > 0 to match metrics)
-        # - Profit (net result after all costs)
-        
-        # Add Revenue (total income)
-        if revenue_value > 0:
-            pie_values.append(revenue_value)
-            pie_labels.append("Revenue")
-            pie_colors.append(colors_map["Revenue"])
-            print(f"[Dashboard] Adding Revenue to pie chart: {revenue_value}")
-        
-        # Add Expenses (recurring costs, separate from loss)
-        if expenses_value > 0:
-            pie_values.append(expenses_value)
-            pie_labels.append("Expenses")
-            pie_colors.append(colors_map["Expenses"])
-            print(f"[Dashboard] Adding Expenses to pie chart: {expenses_value}")
-        
-        # CRITICAL: ALWAYS show Loss if it exists (> 0)
-        # This ensures the pie chart matches the metrics data
-        # Loss represents one-time losses, write-offs, refunds, etc.
-        # Even if Loss is small compared to Revenue, it must be shown
-        if loss_value > 0:
-            pie_values.append(loss_value)
-            pie_labels.append("Loss")
-            pie_colors.append(colors_map["Loss"])
-            print(f"[Dashboard] ✓ Adding Loss to pie chart: {loss_value} (CRITICAL: always shown when > 0 to match metrics)")
-        else:
-            print(f"[Dashboard] ✗ Loss value is 0 or None, not adding to pie chart. loss_value={loss_value}, type={type(loss_value)}")
-        
-        # Add Profit (calculated as Revenue - Expenses - Loss)
-        # Profit shows the net result after all costs
-        # This is what remains after expenses and loss are deducted from revenue
-        if profit_value > 0:
-            pie_values.append(profit_value)
-            pie_labels.append("Profit")
-            pie_colors.append(colors_map["Profit"])
-            print(f"[Dashboard] Adding Profit to pie chart: {profit_value}")
+        # Loss is ALWAYS shown when > 0 (and pulled out) so the pie chart matches the metrics data.
+        values = [metric_values.get(key, 0) for key in _PIE_KEYS]
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("[Dashboard] Generating pie chart from metrics - %s", dict(zip(_PIE_LABELS, values)))
+        return self._build_pie_chart_payload(values)
+    
+    def _build_pie_chart_payload(self, values: List[float]) -> Dict:
+        """Financial Overview pie for (revenue, expenses, loss, profit) values; only segments > 0 are shown.
         
-        print(f"[Dashboard] Pie chart will have {len(pie_values)} segments")
+        The Loss slice is pulled out so it stays visible even when very small.
+        """
+        vals = np.array([float(v or 0) for v in values])
+        idx = np.flatnonzero(vals > 0)
+        pie_values = vals[idx].tolist()
+        pie_labels = [_PIE_LABELS[i] for i in idx]
+        pie_colors = [_PIE_COLORS[i] for i in idx]
+        total = float(vals[idx].sum())
         
-        # If we have at least one segment with data
-        if len(pie_values) > 0 and sum(pie_values) > 0:
-            # If only one segment, add a minimal "Other" segment for visualization
-            if len(pie_values) == 1:
-                other_value = pie_values[0] * 0.01
-                pie_values.append(other_value)
-                pie_labels.append("Other")
-                pie_colors.append("#e5e7eb")  # gray
-                print(f"[Dashboard] Only one segment found, adding minimal 'Other' segment for visualization")
-            
-            # CRITICAL: Print all values being sent to pie chart for debugging
-            print(f"[Dashboard] FINAL pie chart data - Values: {pie_values}, Labels: {pie_labels}, Colors: {pie_colors}")
-            print(f"[Dashboard] Total of all values: {sum(pie_values)}")
-            for i, (val, label) in enumerate(zip(pie_values, pie_labels)):
-                percentage = (val / sum(pie_values)) * 100 if sum(pie_values) > 0 else 0
-                print(f"[Dashboard]   Segment {i+1}: {label} = {val:,.0f} ({percentage:.2f}%)")
-            
-            # CRITICAL: Create pull array to make Loss slice visible by pulling it out
-            # Find Loss index and pull it out to make it visible even if very small
-            pull_array = [0] * len(pie_values)
-            loss_index = None
-            for i, label in enumerate(pie_labels):
-                if label == "Loss":
-                    loss_index = i
-                    break
-            
-            # Pull out Loss slice to make it visible (0.2 = 20% pull)
-            if loss_index is not None:
-                pull_array[loss_index] = 0.2
-                print(f"[Dashboard] Pulling out Loss slice at index {loss_index} to make it visible")
-            
-            return {
-                "data": [{
-                    "type": "pie",
-                    "values": pie_values,
-                    "labels": pie_labels,
-                    "textinfo": "percent+label",
-                    "textposition": "outside",
-                    "marker": {
-                        "colors": pie_colors
-                    },
-                    "hovertemplate": "<b>%{label}</b><br>Value: %{value:,.0f}<br>Percentage: %{percent:.1%}<extra></extra>",
-                    # CRITICAL: Pull out Loss slice to make it visible even if very small
-                    "pull": pull_array,  # Pull Loss slice out
-                    "hole": 0,  # Full pie, not donut
-                    # Ensure small slices are visible by using textinfo
-                    "textfont": {"size": 12},
-                    # Make sure Loss slice is visible even if very small
-                    "insidetextorientation": "radial"
-                }],
-                "layout": {
-                    "title": "Financial Overview",
-                    "showlegend": True,
-                    "legend": {
-                        "orientation": "v",
-                        "x": 1.05,
-                        "y": 0.5
-                    },
-                    # Ensure small slices are visible
-                    "piecolorway": pie_colors
-                }
-            }
-        else:
-            # If no data, return a visible "No Data" chart
-            print(f"[Dashboard] No financial data available for pie chart")
+        if total <= 0:
+            # If no data, return a visible "No Data" chart instead of blank
+            log.debug("[Dashboard] No financial data available for pie chart")
             return {
                 "data": [{
                     "type": "pie",
@@ -1269,452 +1382,63 @@ class DashboardGenerator:
                     "showlegend": False
                 }
             }
-    
-    def _generate_pie_chart_data(self, primary_table: str) -> Optional[Dict]:
-        """Generate pie chart data based on actual revenue and loss calculations."""
-        # Validate primary table name
-        if not self._validate_identifier(primary_table):
-            print(f"[Dashboard] Invalid primary table name for pie chart: {primary_table}")
-            return self._get_default_pie_chart()
         
-        try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                # Validate all column names
-                columns = [col for col in columns if self._validate_identifier(col)]
-                column_types = {col['name']: str(col['type']) for col in columns_info if self._validate_identifier(col['name'])}
-                
-                if not columns:
-                    print(f"[Dashboard] No valid columns found for pie chart in table {primary_table}")
-                    return self._get_default_pie_chart()
-                
-                # Use knowledge base to understand column meanings
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
-                
-                # Find revenue and cost columns (same logic as metrics)
-                numeric_cols = self._find_numeric_columns(columns, column_types, column_descriptions)
-                
-                revenue_col = None
-                cost_col = None
-                expense_col = None  # Separate expense column (recurring expenses)
-                
-                for num_col in numeric_cols:
-                    col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                    col_lower = num_col.lower()
-                    
-                    # Find revenue column
-                    if not revenue_col:
-                        if any(word in col_desc or word in col_lower for word in ['revenue', 'sales', 'income']):
-                            revenue_col = num_col
-                        elif not revenue_col and any(word in col_desc or word in col_lower for word in ['amount', 'total', 'price', 'value']):
-                            revenue_col = num_col
-                    
-                    # Find expense column (recurring expenses, separate from loss)
-                    if not expense_col:
-                        expense_keywords = ['expense', 'cost', 'spent', 'outgoing', 'payment', 'fee', 
-                                          'charge', 'debit', 'withdrawal', 'deduction', 'operating', 'overhead']
-                        if any(word in col_desc or word in col_lower for word in expense_keywords):
-                            # Prefer 'expense' over 'cost' for recurring expenses
-                            if 'expense' in col_lower or 'expense' in col_desc:
-                                expense_col = num_col
-                    
-                    # Find cost/loss column (one-time losses, broader search)
-                    if not cost_col:
-                        loss_keywords = ['loss', 'writeoff', 'bad debt', 'depreciation', 'discount', 'refund', 'return']
-                        # Also check for cost if expense_col is not set
-                        if not expense_col:
-                            loss_keywords.extend(['cost', 'spent', 'outgoing', 'payment', 'fee', 'charge', 'debit', 'withdrawal', 'deduction'])
-                        if any(word in col_desc or word in col_lower for word in loss_keywords):
-                            cost_col = num_col
-                
-                # Get table size to decide query strategy
-                table_size = self._get_table_size_estimate(conn, primary_table)
-                use_limit = table_size > 100000
-                limit_value = 200000 if use_limit else None
-                
-                # Calculate revenue
-                revenue_value = 0
-                if revenue_col and self._validate_identifier(revenue_col):
-                    try:
-                        if use_limit and limit_value:
-                            sum_query = f"""
-                                SELECT SUM(\"{revenue_col}\") 
-                                FROM (
-                                    SELECT \"{revenue_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{revenue_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            sum_query = f"SELECT SUM(\"{revenue_col}\") FROM {primary_table} WHERE \"{revenue_col}\" IS NOT NULL"
-                        result = conn.execute(text(sum_query))
-                        revenue_value = result.scalar() or 0
-                        print(f"[Dashboard] Revenue for pie chart: {revenue_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating revenue for pie chart: {e}")
-                        revenue_value = 0
-                else:
-                    if revenue_col:
-                        print(f"[Dashboard] Revenue column '{revenue_col}' failed validation for pie chart")
-                    else:
-                        print(f"[Dashboard] No revenue column found for pie chart")
-                
-                # Calculate loss (one-time losses)
-                loss_value = 0
-                if cost_col and self._validate_identifier(cost_col):
-                    try:
-                        if use_limit and limit_value:
-                            loss_query = f"""
-                                SELECT SUM(\"{cost_col}\") 
-                                FROM (
-                                    SELECT \"{cost_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{cost_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            loss_query = f"SELECT SUM(\"{cost_col}\") FROM {primary_table} WHERE \"{cost_col}\" IS NOT NULL"
-                        result = conn.execute(text(loss_query))
-                        loss_value = result.scalar() or 0
-                        print(f"[Dashboard] Loss for pie chart: {loss_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating loss for pie chart: {e}")
-                        loss_value = 0
-                
-                # Calculate expenses (recurring expenses, separate from loss)
-                expenses_value = 0
-                if expense_col and self._validate_identifier(expense_col):
-                    try:
-                        if use_limit and limit_value:
-                            expense_query = f"""
-                                SELECT SUM(\"{expense_col}\") 
-                                FROM (
-                                    SELECT \"{expense_col}\" 
-                                    FROM {primary_table} 
-                                    WHERE \"{expense_col}\" IS NOT NULL 
-                                    LIMIT {limit_value}
-                                ) subquery
-                            """
-                        else:
-                            expense_query = f"SELECT SUM(\"{expense_col}\") FROM {primary_table} WHERE \"{expense_col}\" IS NOT NULL"
-                        result = conn.execute(text(expense_query))
-                        expenses_value = result.scalar() or 0
-                        print(f"[Dashboard] Expenses for pie chart: {expenses_value}")
-                    except Exception as e:
-                        print(f"[Dashboard] Error calculating expenses for pie chart: {e}")
-                        expenses_value = 0
-                
-                # If no expense column found but we have revenue, try to find alternative expense columns
-                if expenses_value == 0 and revenue_value > 0:
-                    print(f"[Dashboard] No expense column found for pie chart, searching for alternative expense columns...")
-                    for num_col in numeric_cols:
-                        if num_col != revenue_col and num_col != cost_col and self._validate_identifier(num_col):
-                            col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                            col_lower = num_col.lower()
-                            # Broader keyword matching for expenses
-                            expense_keywords = ['expense', 'cost', 'outgoing', 'spent', 'payment', 'fee', 'charge', 
-                                              'debit', 'withdrawal', 'deduction', 'operating', 'overhead']
-                            if any(word in col_desc or word in col_lower for word in expense_keywords):
-                                print(f"[Dashboard] Found potential expense column for pie chart: {num_col}")
-                                try:
-                                    if use_limit and limit_value:
-                                        expense_query = f"""
-                                            SELECT SUM(\"{num_col}\") 
-                                            FROM (
-                                                SELECT \"{num_col}\" 
-                                                FROM {primary_table} 
-                                                WHERE \"{num_col}\" IS NOT NULL 
-                                                LIMIT {limit_value}
-                                            ) subquery
-                                        """
-                                    else:
-                                        expense_query = f"SELECT SUM(\"{num_col}\") FROM {primary_table} WHERE \"{num_col}\" IS NOT NULL"
-                                    result = conn.execute(text(expense_query))
-                                    calculated_expense = result.scalar() or 0
-                                    if calculated_expense > 0:
-                                        expenses_value = calculated_expense
-                                        print(f"[Dashboard] Successfully calculated expenses for pie chart from {num_col}: {expenses_value}")
-                                        break
-                                except Exception as e:
-                                    print(f"[Dashboard] Error trying expense column {num_col} in pie chart: {e}")
-                                    continue
-                
-                # If no loss column found, try to find alternative loss columns
-                if loss_value == 0 and revenue_value > 0:
-                    print(f"[Dashboard] No loss column found for pie chart, searching for alternative loss columns...")
-                    for num_col in numeric_cols:
-                        if num_col != revenue_col and num_col != expense_col and self._validate_identifier(num_col):
-                            col_desc = column_descriptions.get(num_col, {}).get('description', '').lower()
-                            col_lower = num_col.lower()
-                            # Keywords for losses
-                            loss_keywords = ['loss', 'writeoff', 'bad debt', 'depreciation', 'discount', 'refund', 'return']
-                            if any(word in col_desc or word in col_lower for word in loss_keywords):
-                                print(f"[Dashboard] Found potential loss column for pie chart: {num_col}")
-                                try:
-                                    if use_limit and limit_value:
-                                        loss_query = f"""
-                                            SELECT SUM(\"{num_col}\") 
-                                            FROM (
-                                                SELECT \"{num_col}\" 
-                                                FROM {primary_table} 
-                                                WHERE \"{num_col}\" IS NOT NULL 
-                                                LIMIT {limit_value}
-                                            ) subquery
-                                        """
-                                    else:
-                                        loss_query = f"SELECT SUM(\"{num_col}\") FROM {primary_table} WHERE \"{num_col}\" IS NOT NULL"
-                                    result = conn.execute(text(loss_query))
-                                    calculated_loss = result.scalar() or 0
-                                    if calculated_loss > 0:
-                                        loss_value = calculated_loss
-                                        print(f"[Dashboard] Successfully calculated loss for pie chart from {num_col}: {loss_value}")
-                                        break
-                                except Exception as e:
-                                    print(f"[Dashboard] Error trying loss column {num_col} in pie chart: {e}")
-                                    continue
-                    
-                    # If still no loss found, try looking for negative values in revenue column (returns/refunds)
-                    if loss_value == 0:
-                        print(f"[Dashboard] Trying to find negative values in revenue column for pie chart...")
-                        if revenue_col and self._validate_identifier(revenue_col):
-                            try:
-                                if use_limit and limit_value:
-                                    negative_query = f"""
-                                        SELECT ABS(SUM(\"{revenue_col}\")) 
-                                        FROM (
-                                            SELECT \"{revenue_col}\" 
-                                            FROM {primary_table} 
-                                            WHERE \"{revenue_col}\" < 0 
-                                            LIMIT {limit_value}
-                                        ) subquery
-                                    """
-                                else:
-                                    negative_query = f"SELECT ABS(SUM(\"{revenue_col}\")) FROM {primary_table} WHERE \"{revenue_col}\" < 0"
-                                result = conn.execute(text(negative_query))
-                                negative_sum = result.scalar() or 0
-                                if negative_sum > 0:
-                                    loss_value = negative_sum
-                                    print(f"[Dashboard] Found negative values (returns/refunds) for pie chart: {loss_value}")
-                            except Exception as e:
-                                print(f"[Dashboard] Error checking negative values for pie chart: {e}")
-                
-                # Expenses and Loss are separate - don't overwrite expenses with loss
-                # If expenses_value is still 0 but we found loss, we can use loss as expenses for visualization
-                # But keep them separate if both exist
-                if expenses_value == 0 and loss_value > 0:
-                    # If no separate expense column found, use loss as expenses for visualization
-                    expenses_value = loss_value
-                    print(f"[Dashboard] Using loss as expenses for pie chart visualization")
-                
-                # Calculate profit (Revenue - Expenses - Loss)
-                # Profit = Revenue - (Expenses + Loss)
-                total_costs = expenses_value + loss_value
-                profit_value = revenue_value - total_costs if revenue_value else None
-                if profit_value is not None and profit_value < 0:
-                    profit_value = 0  # Don't show negative profit as a separate segment
-                elif profit_value is not None:
-                    print(f"[Dashboard] Profit calculated: {profit_value} (Revenue: {revenue_value}, Expenses: {expenses_value}, Loss: {loss_value})")
-                
-                # Build pie chart data adaptively based on available data
-                pie_values = []
-                pie_labels = []
-                pie_colors = []
-                
-                # Color scheme: Revenue (light teal), Expenses (light purple), Loss (light orange), Profit (light blue)
-                colors_map = {
-                    "Revenue": "#2dd4bf",    # light teal
-                    "Expenses": "#a78bfa",   # light purple
-                    "Loss": "#fb923c",       # light orange
-                    "Profit": "#60a5fa"      # light blue
-                }
-                
-                # Add segments only if they have meaningful values (> 0)
-                # Always try to show revenue first (even if 0, we'll handle it)
-                if revenue_value is not None and revenue_value > 0:
-                    pie_values.append(revenue_value)
-                    pie_labels.append("Revenue")
-                    pie_colors.append(colors_map["Revenue"])
-                    print(f"[Dashboard] Adding Revenue to pie chart: {revenue_value}")
-                else:
-                    print(f"[Dashboard] Revenue is 0 or None (value: {revenue_value}), skipping from pie chart")
-                
-                if expenses_value and expenses_value > 0:
-                    pie_values.append(expenses_value)
-                    pie_labels.append("Expenses")
-                    pie_colors.append(colors_map["Expenses"])
-                    print(f"[Dashboard] Adding Expenses to pie chart: {expenses_value}")
-                
-                # Loss is separate from expenses (if both exist, show both)
-                # Loss typically represents one-time losses, while expenses are recurring
-                # Only show loss separately if it's different from expenses (not the same column)
-                if loss_value and loss_value > 0:
-                    # Check if loss and expenses are from different sources
-                    # If expenses_value was set from loss_value (fallback), they're the same - don't show both
-                    # But if we have separate expense_col and cost_col, show both
-                    if expenses_value != loss_value:
-                        # They're different - show both
-                        pie_values.append(loss_value)
-                        pie_labels.append("Loss")
-                        pie_colors.append(colors_map["Loss"])
-                        print(f"[Dashboard] Adding Loss to pie chart: {loss_value} (separate from expenses)")
-                    elif expenses_value == 0:
-                        # Only loss exists, expenses will be shown as 0, so show loss
-                        pie_values.append(loss_value)
-                        pie_labels.append("Loss")
-                        pie_colors.append(colors_map["Loss"])
-                        print(f"[Dashboard] Adding Loss to pie chart: {loss_value}")
-                
-                if profit_value is not None and profit_value > 0:
-                    pie_values.append(profit_value)
-                    pie_labels.append("Profit")
-                    pie_colors.append(colors_map["Profit"])
-                    print(f"[Dashboard] Adding Profit to pie chart: {profit_value}")
-                
-                print(f"[Dashboard] Pie chart segments: {len(pie_values)} segments, total value: {sum(pie_values)}")
-                
-                # Show pie chart if we have at least one segment with data
-                if len(pie_values) > 0 and sum(pie_values) > 0:
-                    # If only one segment, add a small "Other" segment for visualization
-                    if len(pie_values) == 1:
-                        # Add a minimal "Other" segment (1% of total) so pie chart shows properly
-                        other_value = pie_values[0] * 0.01
-                        pie_values.append(other_value)
-                        pie_labels.append("Other")
-                        pie_colors.append("#e5e7eb")  # gray
-                        print(f"[Dashboard] Only one segment found, adding minimal 'Other' segment for visualization")
-                    
-                    return {
-                        "data": [{
-                            "type": "pie",
-                            "values": pie_values,
-                            "labels": pie_labels,
-                            "textinfo": "percent+label",
-                            "textposition": "outside",
-                            "marker": {
-                                "colors": pie_colors
-                            },
-                            "hovertemplate": "<b>%{label}</b><br>Value: %{value:,.0f}<br>Percentage: %{percent:.1%}<extra></extra>"
-                        }],
-                        "layout": {
-                            "title": "Financial Overview",
-                            "showlegend": True,
-                            "legend": {
-                                "orientation": "v",
-                                "x": 1.05,
-                                "y": 0.5
-                            }
-                        }
-                    }
-                else:
-                    # If no data, return a visible "No Data" chart instead of blank
-                    print(f"[Dashboard] No financial data available for pie chart (revenue: {revenue_value}, expenses: {expenses_value}, loss: {loss_value})")
-                    return {
-                        "data": [{
-                            "type": "pie",
-                            "values": [1],
-                            "labels": ["No Data Available"],
-                            "marker": {
-                                "colors": ["#e5e7eb"]
-                            },
-                            "textinfo": "label",
-                            "hovertemplate": "No financial data available<extra></extra>"
-                        }],
-                        "layout": {
-                            "title": "Financial Overview",
-                            "showlegend": False
-                        }
-                    }
-        except Exception as e:
-            print(f"[Dashboard] Error generating pie chart: {e}")
-            import traceback
-            traceback.print_exc()
-            # Return a visible error chart instead of blank
-            return {
-                "data": [{
-                    "type": "pie",
-                    "values": [1],
-                    "labels": ["Error Loading Data"],
-                    "marker": {
-                        "colors": ["#ef4444"]
-                    },
-                    "textinfo": "label",
-                    "hovertemplate": "Error loading financial data<extra></extra>"
-                }],
-                "layout": {
-                    "title": "Financial Overview",
-                    "showlegend": False
-                }
-            }
-    
-    def _generate_top_items(self, primary_table: str) -> List[Dict]:
-        """Generate top items list."""
-        try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns = [col['name'] for col in inspector.get_columns(primary_table)]
-                
-                name_col = self._find_column(columns, ['name', 'product', 'item', 'title'])
-                amount_col = self._find_column(columns, ['amount', 'quantity', 'stock', 'used', 'total'])
-                
-                # Validate identifiers before using in query
-                if name_col and amount_col and self._validate_identifier(name_col) and self._validate_identifier(amount_col) and self._validate_identifier(primary_table):
-                    query = f"SELECT \"{name_col}\", \"{amount_col}\" FROM {primary_table} ORDER BY \"{amount_col}\" DESC LIMIT 7"
-                    df = pd.read_sql(query, conn)
-                    
-                    if not df.empty:
-                        max_val = df[amount_col].max()
-                        items = []
-                        colors = ["#2dd4bf", "#2dd4bf", "#a78bfa", "#a78bfa", "#fb923c", "#fb923c", "#f472b6"]
-                        
-                        for idx, row in df.iterrows():
-                            items.append({
-                                "name": str(row[name_col]),
-                                "used": int(row[amount_col]) if pd.notna(row[amount_col]) else 0,
-                                "total": int(max_val * 1.2) if max_val > 0 else 250,
-                                "color": colors[idx % len(colors)]
-                            })
-                        return items
-        except Exception as e:
-            print(f"Error generating top items: {e}")
+        # If only one segment, add a minimal "Other" segment (1% of total) so the pie renders properly
+        if len(pie_values) == 1:
+            pie_values.append(pie_values[0] * 0.01)
+            pie_labels.append("Other")
+            pie_colors.append("#e5e7eb")  # gray
         
-        # Default top items
-        return [
-            {"name": "Item 1", "used": 155, "total": 250, "color": "bg-teal-600"},
-            {"name": "Item 2", "used": 180, "total": 250, "color": "bg-teal-600"},
-            {"name": "Item 3", "used": 105, "total": 250, "color": "bg-purple-600"},
-        ]
-    
-    def _find_column(self, columns: List[str], keywords: List[str]) -> Optional[str]:
-        """Find column matching keywords."""
-        for keyword in keywords:
-            for col in columns:
-                if keyword.lower() in col.lower():
-                    return col
-        return columns[0] if columns else None
+        log.debug("[Dashboard] FINAL pie chart data - Values: %s, Labels: %s", pie_values, pie_labels)
+        
+        trace = {
+            "type": "pie",
+            "values": pie_values,
+            "labels": pie_labels,
+            "textinfo": "percent+label",
+            "textposition": "outside",
+            "marker": {
+                "colors": pie_colors
+            },
+            "hovertemplate": "<b>%{label}</b><br>Value: %{value:,.0f}<br>Percentage: %{percent:.1%}<extra></extra>",
+            "hole": 0,  # Full pie, not donut
+            "textfont": {"size": 12},
+            "insidetextorientation": "radial"
+        }
+        layout = {
+            "title": "Financial Overview",
+            "showlegend": True,
+            "legend": {
+                "orientation": "v",
+                "x": 1.05,
+                "y": 0.5
+            },
+            "piecolorway": pie_colors
+        }
+        if vals[_LOSS_SEGMENT] > 0:
+            # 20% pull on the Loss slice; without one Plotly's default (no pull) is fine, so the key is omitted
+            pull = [0] * len(pie_values)
+            pull[int(np.count_nonzero(vals[:_LOSS_SEGMENT] > 0))] = 0.2
+            trace["pull"] = pull
+        return {"data": [trace], "layout": layout}
     
     def _detect_business_type(self) -> str:
         """Detect business type from database schema."""
         if not self.knowledge_base:
             return "Business"
         
-        table_names = list(self.knowledge_base.keys())
-        table_names_lower = [name.lower() for name in table_names]
-        
-        if any('product' in name or 'inventory' in name or 'stock' in name for name in table_names_lower):
-            return "Inventory"
-        if any('customer' in name or 'client' in name for name in table_names_lower):
-            return "CRM"
-        if any('sale' in name or 'transaction' in name or 'order' in name for name in table_names_lower):
-            return "E-commerce"
-        if any('employee' in name or 'hr' in name or 'staff' in name for name in table_names_lower):
-            return "HR"
+        # The knowledge base is fixed for a session: classify it once
+        cached = self._business_type
+        if cached and cached[0] is self.knowledge_base:
+            return cached[1]
         
-        return "Business"
+        # One search per rule over all names (newline-joined so no keyword spans two names)
+        names_lower = "\n".join(self.knowledge_base.keys()).lower()
+        business_type = next(
+            (label for pattern, label in _BUSINESS_TYPE_RULES if pattern.search(names_lower)), "Business"
+        )
+        self._business_type = (self.knowledge_base, business_type)
+        return business_type
     
     def _get_top_items_title(self) -> str:
         """Get title for top items based on business type."""
@@ -1723,263 +1447,191 @@ class DashboardGenerator:
             return "Most Used Items This Week"
         return "Top Items This Week"
     
-    def _generate_sales_by_category(self, primary_table: str, all_tables: List[str]) -> Dict:
-        """Generate sales by category horizontal bar chart."""
-        default_chart = {
-            "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": self.BAR_CHART_COLORS}}],
-            "layout": {"title": "Sales by Item Category", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Category"}, "height": 300}
-        }
+    @_cached_chart
+    def _sales_breakdowns(self, ctx: SchemaCtx, conn=None) -> Dict[str, List[tuple]]:
+        """Top BREAKDOWN_LIMIT (label, total sales) rows, highest first, for each of _BREAKDOWN_ROLES found in the table.
+        
+        The three "sales by" charts share this; their threads collapse onto one build through _cached_chart.
+        """
+        primary_table = ctx.table
+        sales_col = self._role_col(ctx, "sales")
+        breakdown_cols = {kind: self._role_col(ctx, kind) for kind in _BREAKDOWN_ROLES}
+        breakdown_cols = {kind: col for kind, col in breakdown_cols.items() if col}
+        if not sales_col or not breakdown_cols:
+            return {}
         
+        # Division often resolves to the category column; each distinct column is grouped once
+        distinct = list(dict.fromkeys(breakdown_cols.values()))
+        by_col = {col: [] for col in distinct}
         try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
-                
-                # Find category column
-                category_col = self._find_column_smart(columns, column_descriptions, 
-                    ['category', 'item_category', 'product_category', 'type', 'item_type'])
-                
-                # Find sales/revenue column
-                sales_col = self._find_column_smart(columns, column_descriptions,
-                    ['sales', 'revenue', 'amount', 'total', 'price', 'value'])
-                
-                if category_col and sales_col and self._validate_identifier(category_col) and self._validate_identifier(sales_col):
-                    query = f"""
-                        SELECT "{category_col}", SUM("{sales_col}") as total_sales
-                        FROM {primary_table}
-                        WHERE "{sales_col}" IS NOT NULL
-                        GROUP BY "{category_col}"
-                        ORDER BY total_sales DESC
-                        LIMIT 20
-                    """
-                    df = pd.read_sql(query, conn)
-                    if not df.empty:
-                        # Assign different light colors to each bar
-                        num_bars = len(df)
-                        bar_colors = [self.BAR_CHART_COLORS[i % len(self.BAR_CHART_COLORS)] for i in range(num_bars)]
-                        
-                        return {
-                            "data": [{
-                                "type": "bar",
-                                "orientation": "h",
-                                "x": df['total_sales'].tolist(),
-                                "y": df[category_col].tolist(),
-                                "marker": {"color": bar_colors}
-                            }],
-                            "layout": {
-                                "title": "Sales by Item Category",
-                                "xaxis": {"title": "Sales"},
-                                "yaxis": {"title": "Category"},
-                                "height": 300,
-                                "margin": {"l": 150, "r": 20, "t": 40, "b": 40}
-                            }
-                        }
+            with self._connect(conn) as conn:
+                stmts = self._breakdown_stmts(primary_table, sales_col, tuple(distinct))
+                params = {"top": self.BREAKDOWN_LIMIT}
+                if self.engine.dialect.name == 'postgresql':
+                    k = len(distinct)
+                    for row in conn.execute(stmts[0], params):
+                        i = tuple(row[:k]).index(0)
+                        by_col[distinct[i]].append((row[k + i], row[-1]))
+                else:
+                    for col, stmt in zip(distinct, stmts):
+                        by_col[col] = [(label, total) for label, total in conn.execute(stmt, params)]
         except Exception as e:
-            print(f"[Dashboard] Error generating sales by category: {e}")
+            log.warning("[Dashboard] Error calculating sales breakdowns: %s", e)
+            raise _ChartFailed({})
         
-        return default_chart
+        for rows in by_col.values():
+            rows.sort(key=lambda r: r[1], reverse=True)
+        return {kind: by_col[col] for kind, col in breakdown_cols.items()}
     
-    def _generate_sales_by_product_group(self, primary_table: str, all_tables: List[str]) -> Dict:
-        """Generate sales by product group horizontal bar chart."""
-        default_chart = {
-            "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": self.BAR_CHART_COLORS}}],
-            "layout": {"title": "Sales by Product Group", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Product Group"}, "height": 300}
-        }
-        
-        try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
-                
-                # Find product group column
-                group_col = self._find_column_smart(columns, column_descriptions,
-                    ['product_group', 'group', 'product_group_name', 'item_group', 'segment'])
-                
-                # Find sales/revenue column
-                sales_col = self._find_column_smart(columns, column_descriptions,
-                    ['sales', 'revenue', 'amount', 'total', 'price', 'value'])
-                
-                if group_col and sales_col and self._validate_identifier(group_col) and self._validate_identifier(sales_col):
-                    query = f"""
-                        SELECT "{group_col}", SUM("{sales_col}") as total_sales
-                        FROM {primary_table}
+    def _breakdown_stmts(self, table: str, sales_col: str, cols: tuple) -> tuple:
+        """text() statements for _sales_breakdowns, built once per table and column set."""
+        key = ("sales_breakdowns", table, (sales_col, cols))
+        stmts = self._stmt_cache.get(key)
+        if stmts is None:
+            if self.engine.dialect.name == 'postgresql':
+                # One scan for every breakdown: GROUPING("c") is 0 on the rows grouped by "c". Ranking within
+                # each grouping set keeps only its top :top groups
+                flags = [f"g{i}" for i in range(len(cols))]
+                stmts = (text(f"""
+                    SELECT {", ".join(flags)}, {", ".join(f'"{col}"' for col in cols)}, total_sales
+                    FROM (
+                        SELECT {", ".join(f'GROUPING("{col}") AS {flag}' for col, flag in zip(cols, flags))},
+                               {", ".join(f'"{col}"' for col in cols)},
+                               SUM("{sales_col}") as total_sales,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY {", ".join(f'GROUPING("{col}")' for col in cols)}
+                                   ORDER BY SUM("{sales_col}") DESC
+                               ) AS sales_rank
+                        FROM {table}
                         WHERE "{sales_col}" IS NOT NULL
-                        GROUP BY "{group_col}"
-                        ORDER BY total_sales DESC
-                        LIMIT 20
-                    """
-                    df = pd.read_sql(query, conn)
-                    if not df.empty:
-                        # Assign different light colors to each bar
-                        num_bars = len(df)
-                        bar_colors = [self.BAR_CHART_COLORS[i % len(self.BAR_CHART_COLORS)] for i in range(num_bars)]
-                        
-                        return {
-                            "data": [{
-                                "type": "bar",
-                                "orientation": "h",
-                                "x": df['total_sales'].tolist(),
-                                "y": df[group_col].tolist(),
-                                "marker": {"color": bar_colors}
-                            }],
-                            "layout": {
-                                "title": "Sales by Product Group",
-                                "xaxis": {"title": "Sales"},
-                                "yaxis": {"title": "Product Group"},
-                                "height": 300,
-                                "margin": {"l": 150, "r": 20, "t": 40, "b": 40}
-                            }
-                        }
-        except Exception as e:
-            print(f"[Dashboard] Error generating sales by product group: {e}")
-        
-        return default_chart
+                        GROUP BY GROUPING SETS ({", ".join(f'("{col}")' for col in cols)})
+                    ) ranked
+                    WHERE sales_rank <= :top
+                """),)
+            else:
+                # No GROUPING SETS everywhere: one GROUP BY per distinct column on the same connection
+                stmts = tuple(text(f"""
+                    SELECT "{col}", SUM("{sales_col}") as total_sales
+                    FROM {table}
+                    WHERE "{sales_col}" IS NOT NULL
+                    GROUP BY "{col}"
+                    ORDER BY total_sales DESC
+                    LIMIT :top
+                """) for col in cols)
+            self._stmt_cache[key] = stmts
+        return stmts
     
-    def _generate_sales_by_division(self, primary_table: str, all_tables: List[str]) -> Dict:
-        """Generate sales by division pie chart."""
-        default_chart = {
-            "data": [{"type": "pie", "values": [], "labels": [], "marker": {"colors": ["#2dd4bf", "#fb923c", "#60a5fa", "#a78bfa", "#f472b6"]}}],
-            "layout": {"title": "Sales by Division", "showlegend": True, "height": 300}
+    def _generate_sales_by_category(self, ctx: SchemaCtx, conn=None) -> Dict:
+        """Generate sales by category horizontal bar chart."""
+        rows = self._sales_breakdowns(ctx, conn=conn).get("category", [])
+        if not rows:
+            return copy.deepcopy(self._DEFAULT_CATEGORY_CHART)
+        
+        # Assign different light colors to each bar
+        bar_colors = self._BAR_PALETTE[:len(rows)]
+        return {
+            "data": [{
+                "type": "bar",
+                "orientation": "h",
+                "x": [r[1] for r in rows],
+                "y": [r[0] for r in rows],
+                "marker": {"color": bar_colors}
+            }],
+            "layout": {
+                "title": "Sales by Item Category",
+                "xaxis": {"title": "Sales"},
+                "yaxis": {"title": "Category"},
+                "height": 300,
+                "margin": {"l": 150, "r": 20, "t": 40, "b": 40}
+            }
         }
+    
+    def _generate_sales_by_product_group(self, ctx: SchemaCtx, conn=None) -> Dict:
+        """Generate sales by product group horizontal bar chart."""
+        rows = self._sales_breakdowns(ctx, conn=conn).get("group", [])
+        if not rows:
+            return copy.deepcopy(self._DEFAULT_GROUP_CHART)
         
-        try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
-                
-                # Find division column
-                division_col = self._find_column_smart(columns, column_descriptions,
-                    ['division', 'item_division', 'product_division', 'category', 'type'])
-                
-                # Find sales/revenue column
-                sales_col = self._find_column_smart(columns, column_descriptions,
-                    ['sales', 'revenue', 'amount', 'total', 'price', 'value'])
-                
-                if division_col and sales_col and self._validate_identifier(division_col) and self._validate_identifier(sales_col):
-                    query = f"""
-                        SELECT "{division_col}", SUM("{sales_col}") as total_sales
-                        FROM {primary_table}
-                        WHERE "{sales_col}" IS NOT NULL
-                        GROUP BY "{division_col}"
-                        ORDER BY total_sales DESC
-                    """
-                    df = pd.read_sql(query, conn)
-                    if not df.empty:
-                        return {
-                            "data": [{
-                                "type": "pie",
-                                "values": df['total_sales'].tolist(),
-                                "labels": df[division_col].tolist(),
-                                "marker": {"colors": ["#2dd4bf", "#fb923c", "#60a5fa", "#a78bfa", "#f472b6"]}
-                            }],
-                            "layout": {
-                                "title": "Sales by Division",
-                                "showlegend": True,
-                                "height": 300
-                            }
-                        }
-        except Exception as e:
-            print(f"[Dashboard] Error generating sales by division: {e}")
+        # Assign different light colors to each bar
+        bar_colors = self._BAR_PALETTE[:len(rows)]
+        return {
+            "data": [{
+                "type": "bar",
+                "orientation": "h",
+                "x": [r[1] for r in rows],
+                "y": [r[0] for r in rows],
+                "marker": {"color": bar_colors}
+            }],
+            "layout": {
+                "title": "Sales by Product Group",
+                "xaxis": {"title": "Sales"},
+                "yaxis": {"title": "Product Group"},
+                "height": 300,
+                "margin": {"l": 150, "r": 20, "t": 40, "b": 40}
+            }
+        }
+    
+    def _generate_sales_by_division(self, ctx: SchemaCtx, conn=None) -> Dict:
+        """Generate sales by division pie chart."""
+        rows = self._sales_breakdowns(ctx, conn=conn).get("division", [])
+        if not rows:
+            return copy.deepcopy(self._DEFAULT_DIVISION_CHART)
         
-        return default_chart
+        return {
+            "data": [{
+                "type": "pie",
+                "values": [r[1] for r in rows],
+                "labels": [r[0] for r in rows],
+                "marker": {"colors": list(self._DIVISION_COLORS)}
+            }],
+            "layout": {
+                "title": "Sales by Division",
+                "showlegend": True,
+                "height": 300
+            }
+        }
     
-    def _generate_unsold_items(self, primary_table: str, all_tables: List[str]) -> List[Dict]:
+    @_cached_chart
+    def _generate_unsold_items(self, ctx: SchemaCtx, conn=None) -> List[Dict]:
         """Generate list of unsold items."""
+        primary_table = ctx.table
         try:
-            with self.engine.connect() as conn:
-                inspector = inspect(self.engine)
-                columns_info = inspector.get_columns(primary_table)
-                columns = [col['name'] for col in columns_info]
-                table_kb = self.knowledge_base.get(primary_table, {})
-                column_descriptions = table_kb.get('columns', {})
-                
+            with self._connect(conn) as conn:
                 # Find quantity/sales column to identify unsold items
-                quantity_col = self._find_column_smart(columns, column_descriptions,
-                    ['quantity', 'qty', 'amount', 'sales', 'sold'])
+                quantity_col = self._role_col(ctx, "quantity")
                 
                 # Find product name column
-                name_col = self._find_column_smart(columns, column_descriptions,
-                    ['product_name', 'item_name', 'product', 'item', 'name', 'title'])
+                name_col = self._role_col(ctx, "name")
                 
                 # Find ID column
-                id_col = self._find_column_smart(columns, column_descriptions,
-                    ['id', 'item_id', 'product_id', 'item_code', 'product_code'])
-                
-                if quantity_col and name_col and self._validate_identifier(quantity_col) and self._validate_identifier(name_col):
-                    # Find items with zero or null quantity/sales
-                    query = f"""
-                        SELECT "{id_col if id_col and self._validate_identifier(id_col) else 'NULL'} as id", 
-                               "{name_col}" as name
-                        FROM {primary_table}
-                        WHERE ("{quantity_col}" IS NULL OR "{quantity_col}" = 0)
-                        LIMIT 50
-                    """
-                    df = pd.read_sql(query, conn)
-                    if not df.empty:
-                        return [{"id": str(row.get('id', '')), "name": str(row.get('name', ''))} 
-                               for _, row in df.iterrows()]
+                id_col = self._role_col(ctx, "id")
+                
+                if quantity_col and name_col:
+                    # Find items with zero or null quantity/sales (a literal NULL id when the table has no ID column).
+                    # One text() per table and column set with a bound LIMIT, so the statement text stays stable
+                    key = ("unsold_items", primary_table, (id_col, name_col, quantity_col))
+                    stmt = self._stmt_cache.get(key)
+                    if stmt is None:
+                        id_expr = f'"{id_col}"' if id_col else 'NULL'
+                        stmt = self._stmt_cache[key] = text(f"""
+                            SELECT {id_expr} AS id,
+                                   "{name_col}" AS name
+                            FROM {primary_table}
+                            WHERE ("{quantity_col}" IS NULL OR "{quantity_col}" = 0)
+                            LIMIT :limit
+                        """)
+                    # At most UNSOLD_ITEMS_LIMIT rows: plain tuples are enough, no DataFrame construction
+                    rows = conn.execute(stmt, {"limit": self.UNSOLD_ITEMS_LIMIT}).fetchall()
+                    # No ID column: the id is null, not the string "None"
+                    return [{"id": None if item_id is None else str(item_id), "name": str(name)} for item_id, name in rows]
         except Exception as e:
-            print(f"[Dashboard] Error generating unsold items: {e}")
+            log.warning("[Dashboard] Error generating unsold items: %s", e)
+            raise _ChartFailed([])
         
         return []
     
-    def _get_default_dashboard(self) -> Dict[str, Any]:
+    @classmethod
+    def get_default_dashboard(cls) -> Dict[str, Any]:
         """Return default dashboard when database is not available."""
-        return {
-            "businessType": "Business",
-            "metrics": [
-                {"label": "Receipt", "value": "0", "unit": "", "color": "#f472b6", "icon": "📄"},
-                {"label": "Sales", "value": "0", "unit": "", "color": "#2dd4bf", "icon": "💰"},
-                {"label": "Quantity", "value": "0", "unit": "", "color": "#a78bfa", "icon": "🛒"},
-                {"label": "Cost", "value": "0", "unit": "", "color": "#fb923c", "icon": "💰"},
-                {"label": "Profit", "value": "0", "unit": "", "color": "#60a5fa", "icon": "📈"},
-                {"label": "Unsold Items %", "value": "0.00", "unit": "%", "color": "#2dd4bf", "icon": "📊"}
-            ],
-            "topSellingChart": {
-                "data": [{
-                    "type": "bar",
-                    "orientation": "h",
-                    "x": [],
-                    "y": [],
-                    "marker": {"color": self.BAR_CHART_COLORS}
-                }],
-                "layout": {
-                    "title": "Top Selling Products",
-                    "xaxis": {"title": "Total Sales"},
-                    "yaxis": {"title": "Product"},
-                    "height": 400
-                }
-            },
-            "salesByCategoryChart": {
-                "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": self.BAR_CHART_COLORS}}],
-                "layout": {"title": "Sales by Item Category", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Category"}, "height": 300}
-            },
-            "salesByGroupChart": {
-                "data": [{"type": "bar", "orientation": "h", "x": [], "y": [], "marker": {"color": self.BAR_CHART_COLORS}}],
-                "layout": {"title": "Sales by Product Group", "xaxis": {"title": "Sales"}, "yaxis": {"title": "Product Group"}, "height": 300}
-            },
-            "pieChart": {
-                "data": [{
-                    "type": "pie",
-                    "values": [60, 25, 15],
-                    "labels": ["Revenue", "Expenses", "Loss"],
-                    "marker": {"colors": ["#2dd4bf", "#a78bfa", "#fb923c"]}
-                }],
-                "layout": {"title": "", "showlegend": True}
-            },
-            "salesByDivisionChart": {
-                "data": [{"type": "pie", "values": [], "labels": [], "marker": {"colors": ["#2dd4bf", "#fb923c", "#60a5fa", "#a78bfa", "#f472b6"]}}],
-                "layout": {"title": "Sales by Division", "showlegend": True, "height": 300}
-            },
-            "unsoldItems": []
-        }
+        return copy.deepcopy(cls._DEFAULT_DASHBOARD)
 
@@ -6,6 +6,7 @@ import uuid
 import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 import os
 
 load_dotenv()
@@ -26,15 +27,26 @@ def main():
     try:
         db_url = os.environ.get("DATABASE_URL")
         if not db_url: raise ValueError("DATABASE_URL not found in .env file.")
-        engine = create_engine(db_url)
-        # Test connection
-        with engine.connect() as connection:
-            print("✓ Database connection for query execution is successful.")
+        engine = create_engine(db_url, pool_pre_ping=True, pool_size=1)
+        # One connection for the whole session (also tests it); reopened if the server drops it
+        conn = engine.connect()
+        print("✓ Database connection for query execution is successful.")
     except Exception as e:
         print(f"\n❌ Database connection failed: {e}"); return
 
+    def run_query(sql: str) -> pd.DataFrame:
+        # One transaction per query: committed on success, rolled back on error (so the next query is not aborted)
+        with conn.begin(): return pd.read_sql(sql, conn)
+
     def execute_query(sql: str) -> pd.DataFrame:
-        try: return pd.read_sql(sql, engine)
+        nonlocal conn
+        try:
+            try: return run_query(sql)
+            except DBAPIError as e:
+                # Only a dropped connection is worth a retry; bad SQL (also OperationalError on SQLite) is re-raised
+                if not (e.connection_invalidated or conn.invalidated): raise
+                conn.close(); conn = engine.connect()
+                return run_query(sql)
         except Exception as e: raise Exception(f"Database execution error: {e}")
 
     user_id = str(uuid.uuid4())
@@ -44,34 +56,38 @@ def main():
     print("   Type `/schema` to see what I know, or just ask a question!")
     print("─"*70)
     
-    while True:
-        try:
-            question = input("\n👤 You: ").strip()
-            if question.lower() in ['quit', 'exit', 'q']:
-                print("\n👋 Goodbye!"); break
-            if not question: continue
-            
-            print("🤖 AI is thinking...", end='\r', flush=True)
-            
-            # The call is now simpler: no need to pass the schema.
-            result = chatbot.process(
-                user_prompt=question,
-                user_id=user_id,
-                execute_query=execute_query
-            )
-            
-            print(" " * 20, end='\r')
-            print(f"🤖 AI: {result['response']}")
+    try:
+        while True:
+            try:
+                question = input("\n👤 You: ").strip()
+                if question.lower() in ['quit', 'exit', 'q']:
+                    print("\n👋 Goodbye!"); break
+                if not question: continue
+
+                print("🤖 AI is thinking...", end='\r', flush=True)
+
+                # The call is now simpler: no need to pass the schema.
+                result = chatbot.process(
+                    user_prompt=question,
+                    user_id=user_id,
+                    execute_query=execute_query
+                )
+
+                print(" " * 20, end='\r')
+                print(f"🤖 AI: {result['response']}")
+
+                if result.get('from_cache'): print("   ⚡ (Served from cache)")
+                if result.get('visualization'):
+                    filename = "demo_chart.html"
+                    result['visualization'].write_html(filename)
+                    print(f"   📊 Chart saved to '{filename}'.")
+            except KeyboardInterrupt:
+                print("\n\n👋 Session interrupted. Goodbye!"); break
+            except Exception as e:
+                print(f"\n❌ An unexpected error occurred: {e}")
+    finally:
+        conn.close(); engine.dispose()
 
-            if result.get('from_cache'): print("   ⚡ (Served from cache)")
-            if result.get('visualization'):
-                filename = "demo_chart.html"
-                result['visualization'].write_html(filename)
-                print(f"   📊 Chart saved to '{filename}'.")
-        except KeyboardInterrupt:
-            print("\n\n👋 Session interrupted. Goodbye!"); break
-        except Exception as e:
-            print(f"\n❌ An unexpected error occurred: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
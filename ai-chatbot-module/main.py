@@ -1,35 +1,289 @@
 # ai-chatbot-module/main.py
+import hashlib
 import os
+import threading
+import time
+import uuid
 import uvicorn
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from pydantic import BaseModel
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Optional, Dict
 
+# orjson (optional) encodes chart-heavy payloads several times faster than the stdlib json
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    orjson = None
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
+
+def _orjson_default(value):
+    """Encode the values orjson/json have no native support for: Decimal sums from NUMERIC columns, and
+    pandas Timestamps and NumPy scalars in chart labels."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dashboard_response(data: Dict):
+    """Encode the dashboard dict with orjson directly, skipping FastAPI's jsonable_encoder pass over every chart value."""
+    if orjson is not None:
+        try:
+            body = orjson.dumps(data, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY)
+            return Response(content=body, media_type="application/json")
+        except TypeError:
+            pass  # leave anything orjson cannot encode to FastAPI's encoder
+    return data
+
+
+def figure_to_json(figure) -> str:
+    """Serialize a Plotly figure without re-validating it (it was validated when built)."""
+    # Imported here, not at module level, so plotly only loads once a chart is built (see visualizer._ensure_plotly)
+    import plotly.io as pio
+    return pio.to_json(figure, validate=False, pretty=False)
+
+
+def dumps_chart(figure: Dict) -> str:
+    """Serialize a Plotly JSON dict (create_chart(..., fast_json=True)), with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(figure, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError:
+            pass  # let the stdlib report anything neither encoder can handle
+    return json.dumps(figure, default=_orjson_default)
+
 # Load environment variables
 load_dotenv()
 
 # Import your powerful agent
 from chatbot.agent import ChatbotAgent
 from chatbot.llm_manager import FreeLLMManager
+from chatbot.kb_builder import build_knowledge_base, dump_knowledge_base, load_knowledge_base
+from dashboard_generator import DashboardGenerator
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="AI Report & Insights API",
     description="An API service for the data-aware AI chatbot.",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson-backed responses when orjson is installed (plain JSONResponse otherwise)
+    default_response_class=FastJSONResponse
 )
 
+def _make_engine(url: str):
+    """Engine with a pool sized for concurrent chat and dashboard requests (tunable through DB_POOL_* env vars).
+    
+    pool_size must stay at or above the dashboard's concurrent chart queries (DashboardGenerator.CHART_WORKERS);
+    pre-ping and recycling drop connections the server or a proxy closed while idle.
+    """
+    return create_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=True,
+    )
+
+# Generated knowledge bases are also saved here (one gzipped JSON file per connection string and table limit) so a
+# restart or another worker can skip re-introspecting the database; files older than KB_CACHE_TTL seconds are rebuilt
+KB_CACHE_DIR = os.getenv("KB_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".kb_cache"))
+KB_CACHE_TTL = int(os.getenv("KB_CACHE_TTL", "3600"))
+# Tables introspected per knowledge base; chat and dashboard knowledge bases are cached separately
+CHAT_KB_TABLES = 20
+DASHBOARD_KB_TABLES = 10
+
+
+def _kb_cache_path(url: str, limit: int) -> str:
+    return os.path.join(KB_CACHE_DIR, f"{hashlib.sha256(f'{limit}:{url}'.encode()).hexdigest()}.json.gz")
+
+
+def _load_saved_kb(url: str, limit: int) -> Optional[Dict]:
+    """Knowledge base saved for this connection string and table limit, or None if there is none or it has expired."""
+    path = _kb_cache_path(url, limit)
+    try:
+        if time.time() - os.path.getmtime(path) > KB_CACHE_TTL:
+            return None
+    except OSError:
+        return None
+    try:
+        return load_knowledge_base(path)
+    except Exception as e:
+        # Truncated or corrupt (EOFError, zlib.error, bad JSON, ...): drop it so the next request rebuilds it
+        print(f"Warning: Discarding unreadable knowledge base cache {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def _save_kb(url: str, limit: int, kb: Dict):
+    """Write the knowledge base atomically (temp file + rename) so readers never see a partial file."""
+    path = _kb_cache_path(url, limit)
+    # Unique per write, not just per process: threadpool handlers can save the same knowledge base concurrently
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(KB_CACHE_DIR, exist_ok=True)
+        dump_knowledge_base(kb, tmp_path, compress=True, indent=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not save knowledge base cache: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _restore_saved_kb(url: str, limit: int):
+    """Fill knowledge_base_cache from disk when this process has not built the knowledge base yet."""
+    if (url, limit) not in knowledge_base_cache:
+        saved = _load_saved_kb(url, limit)
+        if saved is not None:
+            knowledge_base_cache[(url, limit)] = saved
+            print(f"✓ Loaded saved knowledge base: {len(saved)} tables")
+
+
+def _forget_kb(url: str) -> bool:
+    """Drop every cached knowledge base for a connection string, in memory and on disk. True if any was cached."""
+    found = False
+    for limit in (CHAT_KB_TABLES, DASHBOARD_KB_TABLES):
+        if knowledge_base_cache.pop((url, limit), None) is not None:
+            found = True
+        try:
+            os.remove(_kb_cache_path(url, limit))
+            found = True
+        except OSError:
+            pass
+    return found
+
+class LRUCache(OrderedDict):
+    """Dict holding at most `maxsize` entries; the least recently used one is evicted (and passed to on_evict).
+    
+    Shared by the threadpool handlers: every method that changes or reorders the dict holds the lock, and
+    keys()/values()/items() return snapshots. on_evict runs outside the lock.
+    """
+
+    def __init__(self, maxsize: int, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        evicted = []
+        with self._lock:
+            old = super().get(key)
+            if old is not None and old is not value:
+                # A replaced value is released like an evicted one (e.g. an engine's pool is disposed)
+                evicted.append((key, old))
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.maxsize:
+                evicted.append(self.popitem(last=False))
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+    def get_or_create(self, key, factory, stale=None):
+        """The value for key; built with factory() when missing (or when stale(value) is true).
+        
+        Check and build happen under the lock, so concurrent first requests share one value instead of
+        each building one and the loser's being overwritten without on_evict.
+        """
+        with self._lock:
+            value = self.get(key)
+            if value is None or (stale is not None and stale(value)):
+                value = factory()
+                self[key] = value
+            return value
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            return super().pop(key, *default)
+
+    def popitem(self, last=True):
+        with self._lock:
+            return super().popitem(last=last)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+    def keys(self):
+        with self._lock:
+            return list(super().keys())
+
+    def values(self):
+        with self._lock:
+            return list(super().values())
+
+    def items(self):
+        with self._lock:
+            return list(super().items())
+
+
+def _release_engine(url: str, engine):
+    """Close an engine's pooled connections and drop the dashboard generator built on it."""
+    try:
+        engine.dispose()
+    except Exception:
+        pass
+    generator = dashboard_generator_cache.pop(url, None)
+    if generator is not None:
+        generator.stop_refresh()
+
+
+def _get_engine(url: str):
+    """The pooled engine for a connection string, created on first use."""
+    def create():
+        # No test connection here: pool_pre_ping validates the connection when a request first checks one out
+        engine = _make_engine(url)
+        print(f"✓ Created new database engine for: {url[:50]}...")
+        return engine
+    return db_engine_cache.get_or_create(url, create)
+
 # --- Global variables (loaded once at startup) ---
 chatbot_agent: ChatbotAgent = None
 db_engine = None
-# Cache for dynamic database engines (keyed by connection string)
-db_engine_cache = {}
-# Cache for knowledge bases per connection string
-knowledge_base_cache = {}
+# Cache for dynamic database engines (keyed by connection string); each holds a connection pool, so only
+# the most recently used ENGINE_CACHE_SIZE are kept and evicted ones are disposed
+db_engine_cache = LRUCache(int(os.getenv("ENGINE_CACHE_SIZE", "8")), on_evict=_release_engine)
+# Cache for knowledge bases per (connection string, table limit) (evicted ones can still be reloaded from KB_CACHE_DIR)
+knowledge_base_cache = LRUCache(int(os.getenv("KB_MEMORY_CACHE_SIZE", "64")))
+# Cache for dashboard generators per connection string (keeps their payload cache warm); dropped with their engine
+dashboard_generator_cache = LRUCache(
+    int(os.getenv("ENGINE_CACHE_SIZE", "8")), on_evict=lambda url, generator: generator.stop_refresh()
+)
 
 # --- Startup Event Handler ---
 @app.on_event("startup")
@@ -44,7 +298,7 @@ def startup_event():
         db_url = os.environ.get("DATABASE_URL")
         if not db_url:
             raise ValueError("DATABASE_URL not found in .env file.")
-        db_engine = create_engine(db_url)
+        db_engine = _make_engine(db_url)
         
         with db_engine.connect() as connection:
             print("✓ Database connection for query execution is successful.")
@@ -54,6 +308,18 @@ def startup_event():
         chatbot_agent = None 
         db_engine = None
 
+# --- Shutdown Event Handler ---
+@app.on_event("shutdown")
+def shutdown_event():
+    """Close every pooled connection (and stop dashboard refreshers) instead of leaving them for the server to time out."""
+    for url, engine in list(db_engine_cache.items()):
+        _release_engine(url, engine)
+    db_engine_cache.clear()
+    knowledge_base_cache.clear()
+    if db_engine is not None:
+        db_engine.dispose()
+    print("--- AI Service shut down; database connections closed. ---")
+
 # --- Pydantic Model for Request Body ---
 class ChatRequest(BaseModel):
     user_prompt: str
@@ -83,78 +349,32 @@ async def process_query(chat_request: ChatRequest):
         raise HTTPException(status_code=400, detail="No database connection string provided. Please configure database connection.")
     
     # Get or create engine for this connection string
-    if target_db_url not in db_engine_cache:
-        try:
-            db_engine_cache[target_db_url] = create_engine(target_db_url)
-            # Test connection
-            with db_engine_cache[target_db_url].connect() as connection:
-                print(f"✓ Created new database connection for: {target_db_url[:50]}...")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to connect to database: {str(e)}")
-    
-    current_db_engine = db_engine_cache[target_db_url]
-    
-    # Get or generate knowledge base for this connection string
-    if target_db_url not in knowledge_base_cache:
-        # Generate knowledge base for this database (optimized for speed - no LLM calls)
-        try:
-            print(f"[Chat] Generating knowledge base for new database connection (fast mode)...")
-            inspector = inspect(current_db_engine)
-            enriched_schema = {}
-            table_names = inspector.get_table_names()
-            
-            # Limit to first 20 tables for speed (can be increased if needed)
-            for table_name in table_names[:20]:
-                # Simple description based on table name (no LLM call for speed)
-                table_desc = table_name.replace('_', ' ').title() + " table"
-                enriched_schema[table_name] = {
-                    "description": table_desc,
-                    "columns": {}
-                }
-                
-                columns = inspector.get_columns(table_name)
-                foreign_keys = {fk['constrained_columns'][0]: fk for fk in inspector.get_foreign_keys(table_name)}
+    try:
+        current_db_engine = _get_engine(target_db_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to connect to database: {str(e)}")
+
+    def load_chat_kb() -> Dict:
+        """Get or generate the knowledge base for this connection string (disk read, reflection, disk write)."""
+        kb_key = (target_db_url, CHAT_KB_TABLES)
+        _restore_saved_kb(*kb_key)
+        if kb_key not in knowledge_base_cache:
+            # Generate knowledge base for this database (optimized for speed - no LLM calls)
+            try:
+                print(f"[Chat] Generating knowledge base for new database connection (fast mode)...")
+                # Limit to first CHAT_KB_TABLES tables for speed (can be increased if needed)
+                enriched_schema = build_knowledge_base(current_db_engine, CHAT_KB_TABLES)
                 
-                for column in columns:
-                    col_name = column['name']
-                    col_type = str(column['type'])
-                    # Simple description based on column name (no LLM call for speed)
-                    col_desc = col_name.replace('_', ' ').title()
-                    
-                    column_info = {
-                        "type": col_type,
-                        "description": col_desc,
-                        "is_primary_key": column.get('primary_key', False),
-                        "foreign_key": None
-                    }
-                    
-                    if col_name in foreign_keys:
-                        fk_info = foreign_keys[col_name]
-                        ref_table = fk_info['referred_table']
-                        ref_column = fk_info['referred_columns'][0]
-                        column_info["foreign_key"] = f"references {ref_table}({ref_column})"
-                    
-                    enriched_schema[table_name]["columns"][col_name] = column_info
-            
-            knowledge_base_cache[target_db_url] = enriched_schema
-            print(f"✓ Generated knowledge base for {len(enriched_schema)} tables (fast mode)")
-        except Exception as e:
-            print(f"Warning: Failed to generate knowledge base, using default: {e}")
-            import traceback
-            traceback.print_exc()
-            # Fall back to default knowledge base
-            knowledge_base_cache[target_db_url] = chatbot_agent.knowledge_base if chatbot_agent.knowledge_base else {}
-    
-    # Temporarily set the agent's knowledge base to the one for this connection
-    original_kb = chatbot_agent.knowledge_base
-    kb_to_use = knowledge_base_cache.get(target_db_url, {})
-    
-    # Ensure we have a valid knowledge base
-    if not kb_to_use:
-        print(f"[Chat] Warning: No knowledge base for connection, using default")
-        kb_to_use = chatbot_agent.knowledge_base if chatbot_agent.knowledge_base else {}
-    
-    chatbot_agent.knowledge_base = kb_to_use
+                knowledge_base_cache[kb_key] = enriched_schema
+                _save_kb(*kb_key, enriched_schema)
+                print(f"✓ Generated knowledge base for {len(enriched_schema)} tables (fast mode)")
+            except Exception as e:
+                print(f"Warning: Failed to generate knowledge base, using default: {e}")
+                import traceback
+                traceback.print_exc()
+                # Fall back to default knowledge base
+                knowledge_base_cache[kb_key] = chatbot_agent.knowledge_base if chatbot_agent.knowledge_base else {}
+        return knowledge_base_cache.get(kb_key, {})
 
     def execute_query_sync(sql: str) -> pd.DataFrame:
         try:
@@ -162,28 +382,47 @@ async def process_query(chat_request: ChatRequest):
         except Exception as e:
             raise Exception(f"Database execution error: {e}")
 
-    try:
-        print(f"[Chat] Processing query: '{chat_request.user_prompt[:50]}...'")
-        result = chatbot_agent.process(
+    def process_with_kb():
+        kb_to_use = load_chat_kb()
+        if not kb_to_use:
+            print(f"[Chat] Warning: No knowledge base for connection, using default")
+        # The knowledge base is passed per call, so concurrent requests for different databases don't interfere
+        return chatbot_agent.process(
             user_prompt=chat_request.user_prompt,
             user_id=chat_request.user_id,
-            execute_query=execute_query_sync
+            execute_query=execute_query_sync,
+            knowledge_base=kb_to_use or chatbot_agent.knowledge_base or {},
+            # The chart is only serialized for the response, so bar charts can skip go.Figure entirely
+            fast_json_charts=True,
+            # Answers (and their SQL) are only reused for the same database
+            cache_scope=target_db_url
         )
+
+    try:
+        print(f"[Chat] Processing query: '{chat_request.user_prompt[:50]}...'")
+        # The knowledge base load/build, LLM calls and pd.read_sql block: run them in the threadpool so the
+        # event loop keeps serving other requests (dashboard, health checks) meanwhile
+        result = await run_in_threadpool(process_with_kb)
         print(f"[Chat] Query processed successfully")
         
         # Handle visualization - convert Plotly figure to JSON if it's a figure object
         if result.get('visualization') is not None:
             viz = result['visualization']
-            # Check if it's a Plotly figure object (has to_json method)
-            if hasattr(viz, 'to_json'):
+            # Already serialized (e.g. a cached result): keep it as is
+            if isinstance(viz, str):
+                pass
+            elif isinstance(viz, bytes):
+                result['visualization'] = viz.decode()
+            # Plain Plotly JSON dict (bar charts built with create_chart(..., fast_json=True))
+            elif isinstance(viz, dict):
+                result['visualization'] = dumps_chart(viz)
+            # Plotly figure object
+            elif hasattr(viz, 'to_json'):
                 try:
-                    result['visualization'] = viz.to_json()
+                    result['visualization'] = figure_to_json(viz)
                 except Exception as viz_error:
                     print(f"Warning: Failed to convert visualization to JSON: {viz_error}")
                     result['visualization'] = None
-            # If it's already a string, keep it as is
-            elif isinstance(viz, str):
-                result['visualization'] = viz
             # Otherwise, set to None
             else:
                 result['visualization'] = None
@@ -200,11 +439,8 @@ async def process_query(chat_request: ChatRequest):
         if "'str' object has no attribute 'to_json'" in error_detail:
             error_detail = "Visualization processing error. Please try again."
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {error_detail}")
-    finally:
-        # Always restore original knowledge base
-        chatbot_agent.knowledge_base = original_kb
 
-@app.get("/dashboard/analytics", tags=["Dashboard"])
+@app.get("/dashboard/analytics", tags=["Dashboard"], response_class=FastJSONResponse)
 def get_dashboard_analytics(connection_string: Optional[str] = None):
     """
     Returns dynamic dashboard analytics data based on the connected database.
@@ -219,96 +455,86 @@ def get_dashboard_analytics(connection_string: Optional[str] = None):
         raise HTTPException(status_code=400, detail="No database connection string provided. Please configure database connection.")
     
     # Get or create engine for this connection string
-    if target_db_url not in db_engine_cache:
-        try:
-            db_engine_cache[target_db_url] = create_engine(target_db_url)
-            with db_engine_cache[target_db_url].connect() as connection:
-                print(f"✓ Created new database connection for dashboard: {target_db_url[:50]}...")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to connect to database: {str(e)}")
+    try:
+        current_engine = _get_engine(target_db_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to connect to database: {str(e)}")
     
     # Get or generate knowledge base for this connection string
-    if target_db_url not in knowledge_base_cache:
+    kb_key = (target_db_url, DASHBOARD_KB_TABLES)
+    _restore_saved_kb(*kb_key)
+    if kb_key not in knowledge_base_cache:
         # Generate knowledge base for this database (simplified for speed)
         try:
             print(f"Generating knowledge base for dashboard database connection...")
-            current_engine = db_engine_cache[target_db_url]
-            inspector = inspect(current_engine)
-            enriched_schema = {}
-            table_names = inspector.get_table_names()
+            # For dashboard, use simpler schema without LLM descriptions for speed (first DASHBOARD_KB_TABLES tables)
+            enriched_schema = build_knowledge_base(current_engine, DASHBOARD_KB_TABLES)
             
-            # For dashboard, use simpler schema without LLM descriptions for speed
-            # We can infer descriptions from column names
-            for table_name in table_names[:10]:  # Limit to first 10 tables for speed
-                enriched_schema[table_name] = {
-                    "description": f"Table containing {table_name} data",
-                    "columns": {}
-                }
-                
-                columns = inspector.get_columns(table_name)
-                foreign_keys = {fk['constrained_columns'][0]: fk for fk in inspector.get_foreign_keys(table_name)}
-                
-                for column in columns:
-                    col_name = column['name']
-                    col_type = str(column['type'])
-                    # Simple description based on column name (no LLM call for speed)
-                    col_desc = col_name.replace('_', ' ').title()
-                    
-                    column_info = {
-                        "type": col_type,
-                        "description": col_desc,
-                        "is_primary_key": column.get('primary_key', False),
-                        "foreign_key": None
-                    }
-                    
-                    if col_name in foreign_keys:
-                        fk_info = foreign_keys[col_name]
-                        ref_table = fk_info['referred_table']
-                        ref_column = fk_info['referred_columns'][0]
-                        column_info["foreign_key"] = f"references {ref_table}({ref_column})"
-                    
-                    enriched_schema[table_name]["columns"][col_name] = column_info
-            
-            knowledge_base_cache[target_db_url] = enriched_schema
+            knowledge_base_cache[kb_key] = enriched_schema
+            _save_kb(*kb_key, enriched_schema)
             print(f"✓ Generated knowledge base for dashboard: {len(enriched_schema)} tables")
         except Exception as e:
             print(f"Warning: Failed to generate knowledge base for dashboard, using default: {e}")
             import traceback
             traceback.print_exc()
             # Fall back to default knowledge base or empty
-            knowledge_base_cache[target_db_url] = chatbot_agent.knowledge_base if chatbot_agent.knowledge_base else {}
+            knowledge_base_cache[kb_key] = chatbot_agent.knowledge_base if chatbot_agent.knowledge_base else {}
     
     # Use the knowledge base for this connection
-    kb_to_use = knowledge_base_cache[target_db_url]
+    kb_to_use = knowledge_base_cache[kb_key]
     
     try:
-        from dashboard_generator import DashboardGenerator
         print(f"[Dashboard] Generating dashboard data for connection: {target_db_url[:50]}...")
-        # Use the cached engine instead of creating a new one
-        current_engine = db_engine_cache[target_db_url]
-        generator = DashboardGenerator(target_db_url, kb_to_use)
-        # Override the engine with the cached one to avoid duplicate connections
-        generator.engine = current_engine
+        def create_generator():
+            # Built on the cached engine so it doesn't open a pool of its own
+            return DashboardGenerator(target_db_url, kb_to_use, engine=current_engine)
+        # Reuse the generator for this connection so repeated loads hit its TTL cache; rebuild it when the
+        # knowledge base has been regenerated (the replaced one is stopped through on_evict)
+        generator = dashboard_generator_cache.get_or_create(
+            target_db_url, create_generator, stale=lambda g: g.knowledge_base is not kb_to_use
+        )
         dashboard_data = generator.generate_dashboard_data()
         print(f"[Dashboard] Dashboard data generated successfully")
         print(f"[Dashboard] Metrics count: {len(dashboard_data.get('metrics', []))}")
         print(f"[Dashboard] Has pie chart: {bool(dashboard_data.get('pieChart'))}")
         print(f"[Dashboard] Has top selling chart: {bool(dashboard_data.get('topSellingChart'))}")
-        return dashboard_data
+        return dashboard_response(dashboard_data)
     except Exception as e:
         print(f"[Dashboard] Error generating dashboard: {e}")
         import traceback
         traceback.print_exc()
         # Return default dashboard instead of raising error
-        try:
-            from dashboard_generator import DashboardGenerator
-            generator = DashboardGenerator(target_db_url, {})
-            default_data = generator._get_default_dashboard()
-            print(f"[Dashboard] Returning default dashboard due to error")
-            return default_data
-        except Exception as fallback_error:
-            print(f"[Dashboard] Even default dashboard failed: {fallback_error}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate dashboard data: {str(e)}")
+        print(f"[Dashboard] Returning default dashboard due to error")
+        return dashboard_response(DashboardGenerator.get_default_dashboard())
+
+# Catalog row estimates (table -> rows) per dialect: one metadata query instead of a COUNT(*) per table
+_ROW_COUNT_SQL = {
+    # reltuples is -1 for tables never vacuumed/analyzed (PostgreSQL 14+); those are skipped
+    "postgresql": """
+        SELECT c.relname, c.reltuples::bigint
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = ANY (current_schemas(false)) AND c.reltuples >= 0
+    """,
+    "mysql": "SELECT table_name, table_rows FROM information_schema.tables WHERE table_schema = DATABASE()",
+    "mariadb": "SELECT table_name, table_rows FROM information_schema.tables WHERE table_schema = DATABASE()",
+    "mssql": """
+        SELECT OBJECT_NAME(object_id), SUM(row_count) FROM sys.dm_db_partition_stats
+        WHERE index_id IN (0, 1) GROUP BY object_id
+    """,
+}
+
+
+def _fast_row_counts(engine) -> Dict[str, int]:
+    """Approximate row counts per table from the database catalog; empty when the dialect has no estimate."""
+    query = _ROW_COUNT_SQL.get(engine.dialect.name)
+    if not query:
+        return {}
+    try:
+        with engine.connect() as conn:
+            return {name: int(rows) for name, rows in conn.execute(text(query)) if rows is not None}
+    except Exception as e:
+        print(f"Warning: Could not read row estimates: {e}")
+        return {}
 
 # 👇 --- NEW ENDPOINT ADDED HERE --- 👇
 @app.get("/database-summary", tags=["Database"])
@@ -323,11 +549,14 @@ def get_database_summary():
         kb = chatbot_agent.knowledge_base
         num_tables = len(kb.keys())
         num_columns = sum(len(table_data['columns']) for table_data in kb.values())
+        row_counts = _fast_row_counts(db_engine) if db_engine else {}
+        known_counts = [row_counts[name] for name in kb if name in row_counts]
 
         summary = {
             "stats": {
                 "total_tables": num_tables,
-                "total_rows": "N/A", # Live counting is a more advanced feature
+                # Catalog estimate summed over the known tables; "N/A" when the database has none
+                "total_rows": sum(known_counts) if known_counts else "N/A",
                 "total_columns": num_columns,
                 "database_size": "N/A"
             },
@@ -351,74 +580,27 @@ def get_database_summary():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {e}")
 
-def generate_description(llm, item_type: str, item_name: str, parent_name: str = None) -> str:
-    """Uses an LLM to generate a plain-English description for a DB object."""
-    if parent_name:
-        prompt = f"The database table is named '{parent_name}'. Generate a very concise, one-sentence, business-focused description for the column named '{item_name}'."
-    else:
-        prompt = f"Generate a very concise, one-sentence, business-focused description for a database table named '{item_name}'."
-    
-    description = llm.generate(
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1,
-        max_tokens=60
-    )
-    return description.strip().replace('"', '')
-
 @app.post("/regenerate-knowledge-base", tags=["Database"])
-async def regenerate_knowledge_base(request: RegenerateKnowledgeBaseRequest):
+def regenerate_knowledge_base(request: RegenerateKnowledgeBaseRequest):
     """
     Regenerates the knowledge base for a given database connection string.
     This should be called when a user connects to a new database.
     Uses fast mode (no LLM calls) for quick response.
     """
+    # A plain def: FastAPI runs it in the threadpool, so the reflection and disk write don't block the event loop
     if not chatbot_agent:
         raise HTTPException(status_code=503, detail="Service is not ready.")
     
     try:
-        engine = create_engine(request.connection_string)
-        inspector = inspect(engine)
+        # Reuse (or create) the pooled engine later chat and dashboard requests for this database will use
+        engine = _get_engine(request.connection_string)
+        # Use fast mode - simple descriptions based on names (no LLM calls); first CHAT_KB_TABLES tables for speed
+        enriched_schema = build_knowledge_base(engine, CHAT_KB_TABLES)
         
-        enriched_schema = {}
-        table_names = inspector.get_table_names()
-        
-        # Use fast mode - simple descriptions based on names (no LLM calls)
-        for table_name in table_names[:20]:  # Limit to first 20 tables for speed
-            print(f"Processing table: '{table_name}'...")
-            # Simple description based on table name
-            table_desc = table_name.replace('_', ' ').title() + " table"
-            
-            enriched_schema[table_name] = {
-                "description": table_desc,
-                "columns": {}
-            }
-            
-            columns = inspector.get_columns(table_name)
-            foreign_keys = {fk['constrained_columns'][0]: fk for fk in inspector.get_foreign_keys(table_name)}
-            
-            for column in columns:
-                col_name = column['name']
-                col_type = str(column['type'])
-                # Simple description based on column name
-                col_desc = col_name.replace('_', ' ').title()
-                
-                column_info = {
-                    "type": col_type,
-                    "description": col_desc,
-                    "is_primary_key": column.get('primary_key', False),
-                    "foreign_key": None
-                }
-                
-                if col_name in foreign_keys:
-                    fk_info = foreign_keys[col_name]
-                    ref_table = fk_info['referred_table']
-                    ref_column = fk_info['referred_columns'][0]
-                    column_info["foreign_key"] = f"references {ref_table}({ref_column})"
-                
-                enriched_schema[table_name]["columns"][col_name] = column_info
-        
-        # Update the cache for this connection string
-        knowledge_base_cache[request.connection_string] = enriched_schema
+        # Replace every cached knowledge base for this connection string (the dashboard one is rebuilt on next use)
+        _forget_kb(request.connection_string)
+        knowledge_base_cache[(request.connection_string, CHAT_KB_TABLES)] = enriched_schema
+        _save_kb(request.connection_string, CHAT_KB_TABLES, enriched_schema)
         
         return {
             "success": True,
@@ -442,16 +624,12 @@ async def clear_old_connections(request: ClearOldConnectionsRequest):
         old_connection_string = request.old_connection_string if request else None
         if old_connection_string:
             # Clear specific connection
-            if old_connection_string in db_engine_cache:
-                try:
-                    db_engine_cache[old_connection_string].dispose()
-                except:
-                    pass
-                del db_engine_cache[old_connection_string]
+            engine = db_engine_cache.pop(old_connection_string, None)
+            if engine is not None:
+                _release_engine(old_connection_string, engine)
                 print(f"✓ Cleared database engine for: {old_connection_string[:50]}...")
             
-            if old_connection_string in knowledge_base_cache:
-                del knowledge_base_cache[old_connection_string]
+            if _forget_kb(old_connection_string):
                 print(f"✓ Cleared knowledge base for: {old_connection_string[:50]}...")
             
             return {
@@ -468,13 +646,8 @@ async def clear_old_connections(request: ClearOldConnectionsRequest):
             for conn_str in connections_to_clear:
                 # Don't clear the default connection
                 if conn_str != default_url:
-                    try:
-                        db_engine_cache[conn_str].dispose()
-                    except:
-                        pass
-                    del db_engine_cache[conn_str]
-                    if conn_str in knowledge_base_cache:
-                        del knowledge_base_cache[conn_str]
+                    _release_engine(conn_str, db_engine_cache.pop(conn_str))
+                    _forget_kb(conn_str)
                     cleared_count += 1
             
             print(f"✓ Cleared {cleared_count} old database connections")